@@ -1,296 +1,320 @@
-import random
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import tkinter as tk
 from tkinter import ttk
 from tkinter.messagebox import showinfo
-#------------------------------------------------------------------------------------------------------------------------------------
-# Parameters
-arrival_probabilities = [0.17, 0.23, 0.25, 0.35]  # For 0, 1, 2, 3 minutes
-a_and_b_service_probs = [0.2, 0.3, 0.5]  # For 1, 2, 3 minutes
-c_service_probs = [0.2, 0.5, 0.3]  # For 3, 5, 7 minutes
-categories = ["A", "B", "C"]
-category_probs = [0.2, 0.35, 0.45]
-
-# Queues for pumps
-pump_95 = []
-pump_90 = []
-pump_gas = []
-
-# Metrics
-cars_served = 0
-total_wait_time = 0
-waiting_times = {"95 Octane": [], "90 Octane": [], "Gas": []}
-queue_lengths = {"95 Octane": [], "90 Octane": [], "Gas": []}
-service_times = {"A": [], "B": [], "C": []}
-idle_times = {"95 Octane": 0, "90 Octane": 0, "Gas": 0}
-pump_last_end_time = {"95 Octane": 0, "90 Octane": 0, "Gas": 0}
-waiting_cars = {"95 Octane": 0, "90 Octane": 0, "Gas": 0}
-#-----------------------------------------------------------------------------------------------------------------------------
-# Table to store simulation details
-simulation_table = []
-
-def get_cumulative_intervals(probabilities): #[0.17, 0.23, 0.25, 0.35]
-                                             #[17,40,65,100]
-    #Convert probabilities to cumulative intervals
-    cumulative = []
-    total = 0
-    for p in probabilities:
-        total += p
-        cumulative.append(total * 100)  # Convert to percentage scale (0-100)
-    return cumulative
-
-def map_random_to_value(random_num, cumulative_intervals, values): 
-    #Map a random number (0-100) to a value based on cumulative intervals.
-    for i, upper_bound in enumerate(cumulative_intervals):
-        if random_num < upper_bound:
-            return values[i]
-    return values[-1]  # Default to last value if no match
-
-def simulate(n_cars):
-    global cars_served, total_wait_time 
-    time = 0
-    car_number = 0
-
-    # Compute cumulative intervals
-    arrival_intervals = get_cumulative_intervals(arrival_probabilities)
-    a_and_b_service_intervals = get_cumulative_intervals(a_and_b_service_probs)
-    c_service_intervals = get_cumulative_intervals(c_service_probs)
-    category_intervals = get_cumulative_intervals(category_probs)
-
-    while car_number < n_cars:
-        # Generate car arrival
-        random_arrival = random.randint(0, 99)
-        inter_arrival_time = map_random_to_value(random_arrival, arrival_intervals, [0, 1, 2, 3])
-        time += inter_arrival_time
-        random_category = random.randint(0, 99)
-        car_category = map_random_to_value(random_category, category_intervals, categories)
-
-        if car_category == "A":
-            random_service = random.randint(0, 99)
-            service_time = map_random_to_value(random_service, a_and_b_service_intervals, [1, 2, 3])
-            pump = "95 Octane"
-            queue = pump_95
-
-        elif car_category == "B":
-            if len(pump_90) > 3 and random.random() < 0.6:
-                random_service = random.randint(0, 99)
-                service_time = map_random_to_value(random_service, a_and_b_service_intervals, [1, 2, 3])
-                pump = "95 Octane"
-                queue = pump_95
-            else:
-                random_service = random.randint(0, 99)
-                service_time = map_random_to_value(random_service, a_and_b_service_intervals, [1, 2, 3])
-                pump = "90 Octane"
-                queue = pump_90
-
-        elif car_category == "C":
-            if len(pump_gas) > 4 and random.random() < 0.4:
-                random_service = random.randint(0, 99)
-                service_time = map_random_to_value(random_service, c_service_intervals, [3, 5, 7])
-                pump = "90 Octane"
-                queue = pump_90
-            else:
-                random_service = random.randint(0, 99)
-                service_time = map_random_to_value(random_service, c_service_intervals, [3, 5, 7])
-                pump = "Gas"
-                queue = pump_gas
-
-        # Record service start and end times
-        service_start = max(time, queue[-1][2] if queue else 0)
-        service_end = service_start + service_time
-
-        # Update idle time
-        idle_times[pump] += max(0, service_start - pump_last_end_time[pump])
-        pump_last_end_time[pump] = service_end
-
-        # Append to queue
-        queue.append((time, service_time, service_end))
-
-        # waiting times and queue lengths
-        waiting_times[pump].append(service_start - time)
-        waiting_cars[pump] += 1 if service_start > time else 0
-        queue_lengths[pump].append(len(queue))
-
-        # service times
-        service_times[car_category].append(service_time)
-
-        # simulation details
-        simulation_table.append({
-            "Car Number": car_number + 1,
-            "Random Category Number": random_category,
-            "Category": car_category,
-            "Random Arrival Time": random_arrival,
-            "Time Between Arrivals": inter_arrival_time,
-            "Time in Clock": time,
-            "Random Service Time": random_service,
-            "Service Start (95 Octane)": service_start if pump == "95 Octane" else None,
-            "Service Time (95 Octane)": service_time if pump == "95 Octane" else None,
-            "Service End (95 Octane)": service_end if pump == "95 Octane" else None,
-            "Service Start (90 Octane)": service_start if pump == "90 Octane" else None,
-            "Service Time (90 Octane)": service_time if pump == "90 Octane" else None,
-            "Service End (90 Octane)": service_end if pump == "90 Octane" else None,
-            "Service Start (Gas)": service_start if pump == "Gas" else None,
-            "Service Time (Gas)": service_time if pump == "Gas" else None,
-            "Service End (Gas)": service_end if pump == "Gas" else None
-        })
-
-        car_number += 1
-        
-    # Results
-    df = pd.DataFrame(simulation_table)
-    print(df.to_string(index=False))
-
-# Function to run the simulation
-def run_simulation():
-    try:
-        n_cars = int(num_cars_entry.get())  # Get the number of cars from the input box
-        if n_cars <= 0:
-            raise ValueError(" cars should be positive.")
-    except ValueError as e:
-        showinfo("Input Error", f"Invalid input for number of cars: {e}")
-        return
-
-    simulation_table.clear()  # Clear previous simulation data
-    simulate(n_cars)  # Run the simulation with the specified number of cars
-
-    # Update the table with simulation results
-    for row in tree.get_children():
-        tree.delete(row)
-    for entry in simulation_table:
-        tree.insert("", tk.END, values=[entry[col] for col in columns])
-
-    # Update statistics
-    stats_text.set(get_statistics())
-
-    # Update histograms
-    update_histograms()
-
-def get_statistics():
-    # Compute and format statistics
-    avg_service_times = {cat: (sum(times) / len(times) if times else 0) for cat, times in service_times.items()}
-    avg_wait_times = {pump: (sum(times) / len(times) if times else 0) for pump, times in waiting_times.items()}
-    max_queue_lengths = {pump: max(lengths) if lengths else 0 for pump, lengths in queue_lengths.items()}
-    prob_car_waits = {pump: (waiting_cars[pump] / len(simulation_table)) for pump in waiting_cars}
-    total_time = max(pump_last_end_time.values())
-    idle_portions = {pump: (idle_times[pump] / total_time) for pump in idle_times}
-
-    # Analyze the effect of adding one extra pump
-    reduction_effect = {}
-    for pump in waiting_times:
-        if waiting_times[pump]:
-            original_avg_wait = sum(waiting_times[pump]) / len(waiting_times[pump])
-            hypothetical_wait = [time * 0.5 for time in waiting_times[pump]]  # Assume 50% reduction
-            reduced_avg_wait = sum(hypothetical_wait) / len(hypothetical_wait)
-            reduction_effect[pump] = original_avg_wait - reduced_avg_wait
-
-    best_pump = max(reduction_effect, key=reduction_effect.get)
-
-    stats = "--- Statistics ---\n"
-    stats += "1. Average Service Times:\n"
-    for cat, avg_time in avg_service_times.items():
-        stats += f"   Category {cat}: {avg_time:.2f} minutes\n"
-
-    stats += "\n2. Average Waiting Times:\n"
-    for pump, avg_wait in avg_wait_times.items():
-        stats += f"   {pump}: {avg_wait:.2f} minutes\n"
-    overall_avg_wait = sum(sum(times) for times in waiting_times.values()) / sum(len(times) for times in waiting_times.values())
-    stats += f"   Overall: {overall_avg_wait:.2f} minutes\n"
-
-    stats += "\n3. Maximum Queue Lengths:\n"
-    for pump, max_length in max_queue_lengths.items():
-        stats += f"   {pump}: {max_length} cars\n"
-
-    stats += "\n4. Probability that a car waits:\n"
-    for pump, prob in prob_car_waits.items():
-        stats += f"   {pump}: {prob:.2%}\n"
-
-    stats += "\n5. Portion of Idle Time:\n"
-    for pump, portion in idle_portions.items():
-        stats += f"   {pump}: {portion:.2%}\n"
-
-    stats += "\n6. Impact of Adding One Extra Pump:\n"
-    for pump, reduction in reduction_effect.items():
-        stats += f"   {pump}: Reduction in avg wait time = {reduction:.2f} minutes\n"
-    stats += f"   Best pump to add: {best_pump}\n"
-
-    return stats
-
-def update_histograms():
-    # Clear existing figures
-    for widget in histogram_frame.winfo_children():
-        widget.destroy()
-
-    # Create histograms for each pump
-    for pump, times in waiting_times.items():
-        if times:
-            fig, ax = plt.subplots(figsize=(4, 3))
-            ax.hist(times, bins=10, color='blue', alpha=0.7, edgecolor='black')
+from virtual_table import VirtualTable
+from background_run import BackgroundRun
+from profiling import PerformancePanel, PhaseProfiler, profile_argument
+from run_cache import RunCache, default_directory
+from gas_station import (
+    columns, pumps, simulate_cached, get_statistics, run_replications, format_replications, evaluate_extra_pump,
+    what_if_max_cars,
+)
+
+class HistogramPanel:
+    # One figure with an axes per pump, built once; each run only moves and resizes the existing bars
+    def __init__(self, master, bins=10):
+        # matplotlib is only imported once a window is actually built
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.bins = bins
+        self.figure = Figure(figsize=(12, 3))
+        self.axes = {}
+        self.bars = {}
+        for index, pump in enumerate(pumps):
+            ax = self.figure.add_subplot(1, len(pumps), index + 1)
             ax.set_title(f"{pump} Wait Times")
             ax.set_xlabel("Wait Time (minutes)")
             ax.set_ylabel("Frequency")
-
-            canvas = FigureCanvasTkAgg(fig, master=histogram_frame)
-            canvas_widget = canvas.get_tk_widget()
-            canvas_widget.pack(side="left", padx=10, pady=10)
-
-# Create the GUI window
-root = tk.Tk()
-root.title("Simulation Results")
-
-# Input frame for the number of cars
-input_frame = ttk.Frame(root)
-input_frame.pack(pady=10, padx=10, fill="x")
-
-num_cars_label = ttk.Label(input_frame, text="Number of Cars:")
-num_cars_label.pack(side="left", padx=5)
-
-num_cars_entry = ttk.Entry(input_frame)
-num_cars_entry.pack(side="left", padx=5)
-
-run_button = ttk.Button(input_frame, text="Run Simulation", command=run_simulation)
-run_button.pack(side="left", padx=10)
-
-# Create a notebook for section tabs
-notebook = ttk.Notebook(root)
-notebook.pack(fill="both", expand=True, padx=10, pady=10)
-
-# Create a frame for the table
-table_frame = ttk.Frame(notebook)
-notebook.add(table_frame, text="Simulation Table")
-
-# Define columns for the treeview
-columns = ["Car Number", "Random Category Number", "Category", "Random Arrival Time", "Time Between Arrivals", "Time in Clock", "Random Service Time", "Service Start (95 Octane)", "Service Time (95 Octane)", "Service End (95 Octane)", "Service Start (90 Octane)", "Service Time (90 Octane)", "Service End (90 Octane)", "Service Start (Gas)", "Service Time (Gas)", "Service End (Gas)"]
-
-# Create the treeview widget
-tree = ttk.Treeview(table_frame, columns=columns, show="headings")
-for col in columns:
-    tree.heading(col, text=col)
-    tree.column(col, width=120, anchor="center")
-tree.pack(side="left", fill="both", expand=True)
-
-# Add a scrollbar
-scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
-scrollbar.pack(side="right", fill="y")
-tree.configure(yscroll=scrollbar.set)
-
-# Create a frame for statistics
-stats_frame = ttk.Frame(notebook)
-notebook.add(stats_frame, text="Statistics")
-
-# Label for statistics
-stats_text = tk.StringVar()
-stats_label = ttk.Label(stats_frame, textvariable=stats_text, justify="left")
-stats_label.pack(anchor="w", padx=10, pady=5)
-
-# Create a frame for histograms
-histogram_frame = ttk.Frame(notebook)
-notebook.add(histogram_frame, text="Histograms")
-
-# Start the GUI loop
-root.mainloop()
-
-
-
-
+            self.bars[pump] = ax.bar(range(bins), [0] * bins, width=1, align="edge",
+                                     color='blue', alpha=0.7, edgecolor='black')
+            self.axes[pump] = ax
+        self.figure.tight_layout()
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+
+    def update(self, histograms, draw_now=False):
+        # histograms: {pump: (counts, edges)} with self.bins counts, as returned by wait_histograms();
+        # draw_now renders before returning (for timing) instead of when Tk is next idle
+        for pump, ax in self.axes.items():
+            if pump not in histograms:
+                for rect in self.bars[pump]:
+                    rect.set_height(0)
+                continue
+            counts, edges = histograms[pump]
+            for rect, height, left, right in zip(self.bars[pump], counts, edges[:-1], edges[1:]):
+                rect.set_x(left)
+                rect.set_width(right - left)
+                rect.set_height(height)
+            ax.set_xlim(edges[0], edges[-1])
+            ax.set_ylim(0, max(counts.max(), 1) * 1.05)
+        if draw_now:
+            self.canvas.draw()
+        else:
+            self.canvas.draw_idle()
+
+class SimulationApp:
+    # The gas-station window: inputs, a background run, and the table / statistics / histogram tabs
+    def __init__(self, root, profile_path=None):
+        root.title("Simulation Results")
+        self.profile_path = profile_path  # From --profile: every run is profiled and its cProfile stats dumped here
+        self.profiler = PhaseProfiler(enabled=False)
+        # Seeded runs are kept (summaries, what-if and replication results also on disk), so re-running or
+        # extending one does not start over
+        self.run_cache = RunCache(directory=default_directory)
+
+        # Input frame for the number of cars
+        self.input_frame = ttk.Frame(root)
+        self.input_frame.pack(pady=10, padx=10, fill="x")
+
+        self.num_cars_label = ttk.Label(self.input_frame, text="Number of Cars:")
+        self.num_cars_label.pack(side="left", padx=5)
+
+        self.num_cars_entry = ttk.Entry(self.input_frame)
+        self.num_cars_entry.pack(side="left", padx=5)
+
+        # Blank: new random numbers every run; a number makes the run reproducible and cached
+        self.seed_label = ttk.Label(self.input_frame, text="Seed:")
+        self.seed_label.pack(side="left", padx=5)
+
+        self.seed_entry = ttk.Entry(self.input_frame, width=8)
+        self.seed_entry.pack(side="left", padx=5)
+
+        self.replications_label = ttk.Label(self.input_frame, text="Replications:")
+        self.replications_label.pack(side="left", padx=5)
+
+        self.replications_entry = ttk.Entry(self.input_frame, width=6)
+        self.replications_entry.insert(0, "1")
+        self.replications_entry.pack(side="left", padx=5)
+
+        self.servers_label = ttk.Label(self.input_frame, text="Pumps (95/90/Gas):")
+        self.servers_label.pack(side="left", padx=5)
+
+        self.servers_entry = ttk.Entry(self.input_frame, width=8)
+        self.servers_entry.insert(0, "1,1,1")
+        self.servers_entry.pack(side="left", padx=5)
+
+        self.what_if_label = ttk.Label(self.input_frame, text="What-if runs:")
+        self.what_if_label.pack(side="left", padx=5)
+
+        # Paired runs of the extra-pump what-if (0 turns it off); each re-simulates four configurations
+        # of at most what_if_max_cars cars
+        self.what_if_entry = ttk.Entry(self.input_frame, width=6)
+        self.what_if_entry.insert(0, "10")
+        self.what_if_entry.pack(side="left", padx=5)
+
+        self.summary_only = tk.BooleanVar(value=False)
+        self.summary_only_check = ttk.Checkbutton(self.input_frame, text="Summary only", variable=self.summary_only)
+        self.summary_only_check.pack(side="left", padx=5)
+
+        # Replications as antithetic pairs: tighter intervals for the same number of cars (see the runs saved)
+        self.antithetic = tk.BooleanVar(value=True)
+        self.antithetic_check = ttk.Checkbutton(self.input_frame, text="Antithetic pairs", variable=self.antithetic)
+        self.antithetic_check.pack(side="left", padx=5)
+
+        # Steady state: drop the warm-up from empty pumps and give batch-means CIs from the one long run
+        self.steady_state = tk.BooleanVar(value=False)
+        self.steady_state_check = ttk.Checkbutton(self.input_frame, text="Steady state", variable=self.steady_state)
+        self.steady_state_check.pack(side="left", padx=5)
+
+        # Optional stopping rule: Number of Cars becomes a maximum, the run ends at this relative precision
+        self.precision_label = ttk.Label(self.input_frame, text="Stop at ± %:")
+        self.precision_label.pack(side="left", padx=5)
+
+        self.precision_entry = ttk.Entry(self.input_frame, width=5)
+        self.precision_entry.pack(side="left", padx=5)
+
+        # Wall time and peak memory per phase in the Performance tab; tracemalloc makes the run itself slower
+        self.profile = tk.BooleanVar(value=profile_path is not None)
+        self.profile_check = ttk.Checkbutton(self.input_frame, text="Profile", variable=self.profile)
+        self.profile_check.pack(side="left", padx=5)
+
+        self.run_button = ttk.Button(self.input_frame, text="Run Simulation", command=self.run_simulation)
+        self.run_button.pack(side="left", padx=10)
+
+        self.cancel_button = ttk.Button(self.input_frame, text="Cancel", command=self.cancel_simulation, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+
+        self.status_text = tk.StringVar(value="Ready")
+        self.status_label = ttk.Label(self.input_frame, textvariable=self.status_text)
+        self.status_label.pack(side="left", padx=10)
+
+        # Simulations run on a worker thread so the window stays responsive
+        self.background = BackgroundRun(root)
+
+        # Create a notebook for section tabs
+        self.notebook = ttk.Notebook(root)
+        self.notebook.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Create a frame for the table
+        self.table_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.table_frame, text="Simulation Table")
+
+        # Create the table widget, with its own scrollbar, row count and jump-to-row
+        self.table = VirtualTable(self.table_frame, columns=columns, column_width=120)
+        self.table.pack(fill="both", expand=True)
+
+        # Create a frame for statistics
+        self.stats_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.stats_frame, text="Statistics")
+
+        # Label for statistics
+        self.stats_text = tk.StringVar()
+        self.stats_label = ttk.Label(self.stats_frame, textvariable=self.stats_text, justify="left")
+        self.stats_label.pack(anchor="w", padx=10, pady=5)
+
+        # Create a frame for histograms
+        self.histogram_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.histogram_frame, text="Histograms")
+        self.histogram_panel = HistogramPanel(self.histogram_frame)
+
+        # Create a frame for the phase timings of the last profiled run
+        self.performance_frame = ttk.Frame(self.notebook)
+        self.notebook.add(self.performance_frame, text="Performance")
+        self.performance_panel = PerformancePanel(self.performance_frame)
+
+    def run_simulation(self):
+        try:
+            n_cars = int(self.num_cars_entry.get())  # Get the number of cars from the input box
+            if n_cars <= 0:
+                raise ValueError(" cars should be positive.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for number of cars: {e}")
+            return
+        try:
+            seed_text = self.seed_entry.get().strip()
+            seed = int(seed_text) if seed_text else None
+            if seed is not None and seed < 0:
+                raise ValueError(" seed should not be negative.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for seed: {e}")
+            return
+        try:
+            replications = int(self.replications_entry.get())
+            if replications <= 0:
+                raise ValueError(" replications should be positive.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for replications: {e}")
+            return
+        try:
+            servers = tuple(int(value) for value in self.servers_entry.get().split(","))
+            if len(servers) != len(pumps) or min(servers) <= 0:
+                raise ValueError(f" give {len(pumps)} positive pump counts, e.g. 1,1,1.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for pumps: {e}")
+            return
+        try:
+            what_if_runs = int(self.what_if_entry.get())
+            if what_if_runs == 1 or what_if_runs < 0:
+                raise ValueError(" what-if runs should be 0 (off) or at least 2.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for what-if runs: {e}")
+            return
+        try:
+            precision_text = self.precision_entry.get().strip()
+            relative_precision = float(precision_text) / 100 if precision_text else None
+            if relative_precision is not None and relative_precision <= 0:
+                raise ValueError(" precision should be a positive percentage.")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid input for precision: {e}")
+            return
+
+        with_summary_only = self.summary_only.get()  # Tk variables are only read on the main thread
+        antithetic = self.antithetic.get()
+        steady_state = self.steady_state.get() or relative_precision is not None
+        profiler = PhaseProfiler(enabled=self.profile.get() or self.profile_path is not None,
+                                 profile_path=self.profile_path)
+        self.profiler = profiler
+        run_cache = self.run_cache
+
+        def work(report, cancel):
+            # Runs on the worker thread: no Tk calls in here, results go back through show_results
+            simulation_progress = lambda done, total: report(done, total, "Simulating cars")
+            with profiler.phase("Simulation"):
+                # Summary only keeps constant memory: running statistics plus every 1000th car for the table
+                state, trace = simulate_cached(run_cache, n_cars, seed, servers=servers, summary_only=with_summary_only,
+                                               relative_precision=relative_precision, progress=simulation_progress,
+                                               cancel=cancel)
+                rows = trace.to_table() if with_summary_only else state.table()
+            # Fewer than n_cars when the stopping rule ended the run
+            cars = state.cars if with_summary_only else len(state.trace)
+
+            # The extra-pump what-if re-simulates every +1 configuration with common random numbers
+            extra_pump = None
+            if what_if_runs:
+                what_if_progress = lambda done, total: report(done, total, "Extra pump what-if runs")
+                with profiler.phase("Extra pump what-if"):
+                    extra_pump = evaluate_extra_pump(min(cars, what_if_max_cars), what_if_runs, seed=seed,
+                                                     servers=servers, progress=what_if_progress, cancel=cancel,
+                                                     cache=run_cache)
+
+            # Statistics, with confidence intervals over independent replications when asked
+            with profiler.phase("Statistics"):
+                stats = get_statistics(state, extra_pump, steady_state=steady_state)
+            if replications > 1:
+                replication_progress = lambda done, total: report(done, total, "Replications")
+                with profiler.phase("Replications"):
+                    aggregate = run_replications(cars, replications, seed=seed, progress=replication_progress,
+                                                 cancel=cancel, servers=servers, antithetic=antithetic,
+                                                 cache=run_cache)
+                stats += format_replications(aggregate, replications, section=7 if extra_pump else 6)
+            return state, rows, stats, cars
+
+        # One run at a time: the Run button stays disabled until this one finishes or is cancelled
+        self.run_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.status_text.set("Starting...")
+        self.background.start(work, on_done=self.show_results, on_progress=self.show_progress,
+                              on_error=self.run_failed, on_cancelled=self.run_cancelled)
+
+    def cancel_simulation(self):
+        self.background.cancel()
+        self.status_text.set("Cancelling...")
+
+    def show_progress(self, done, total, message):
+        self.status_text.set(f"{message}: {done:,}/{total:,} ({done / total:.0%})")
+
+    def show_results(self, result):
+        state, rows, stats, cars = result
+
+        # Update the table with simulation results (only the rows in view are put in the Treeview)
+        with self.profiler.phase("Table"):
+            self.table.set_data(rows)
+
+        # Update statistics
+        self.stats_text.set(stats)
+
+        # Update histograms
+        with self.profiler.phase("Histograms"):
+            self.update_histograms(state)
+        self.finish_run(f"Done: {cars:,} cars (cache: {self.run_cache.describe()})")
+        if self.profiler.enabled:
+            self.performance_panel.show(self.profiler)
+
+    def run_cancelled(self, error):
+        self.finish_run("Cancelled")
+
+    def run_failed(self, error):
+        self.finish_run("Failed")
+        showinfo("Simulation Error", f"The simulation failed: {error}")
+
+    def finish_run(self, status):
+        self.profiler.finish()
+        self.run_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+        self.status_text.set(status)
+
+    def update_histograms(self, state):
+        # Redraw the persistent histogram panel from precomputed bin counts
+        self.histogram_panel.update(state.wait_histograms(self.histogram_panel.bins), draw_now=self.profiler.enabled)
+
+def main():
+    # Create the GUI window and start the GUI loop; --profile [PATH] profiles every run
+    profile_path = profile_argument()
+    root = tk.Tk()
+    SimulationApp(root, profile_path)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import queue
+import threading
+
+class BackgroundRun:
+    # Runs work(report, cancel) on a worker thread so the Tk event loop keeps running.
+    # The worker only talks to Tk through a queue that the main thread polls with root.after:
+    # report(done, total, message) shows progress, cancel is a threading.Event the work should check.
+    def __init__(self, root, poll_ms=100):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.messages = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.callbacks = {}
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, work, on_done, on_progress=None, on_error=None, on_cancelled=None):
+        if self.running:
+            raise RuntimeError("a run is already in progress")
+        self.cancel_event = threading.Event()
+        self.messages = queue.Queue()
+        self.callbacks = {"done": on_done, "progress": on_progress, "error": on_error, "cancelled": on_cancelled}
+        self.thread = threading.Thread(target=self._work, args=(work, self.messages, self.cancel_event), daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _work(self, work, messages, cancel_event):
+        def report(done, total, message=""):
+            messages.put(("progress", (done, total, message)))
+        try:
+            messages.put(("done", work(report, cancel_event)))
+        except Exception as error:
+            # Whatever the work raised after a cancel request counts as a clean cancel
+            messages.put(("cancelled" if cancel_event.is_set() else "error", error))
+
+    def _poll(self):
+        # Drain the queue on the Tk thread; only the latest progress message is shown
+        latest_progress = None
+        while True:
+            try:
+                kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                latest_progress = payload
+                continue
+            if latest_progress is not None and self.callbacks["progress"]:
+                self.callbacks["progress"](*latest_progress)
+            callback = self.callbacks[kind]
+            if callback:
+                callback(payload)
+            elif kind == "error":
+                raise payload
+            return
+        if latest_progress is not None and self.callbacks["progress"]:
+            self.callbacks["progress"](*latest_progress)
+        self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,221 @@
+import argparse
+import sys
+
+import numpy as np
+
+import gas_station
+import hospital
+from columnar_output import ColumnarWriter, formats, resolve_format, write_columns
+
+# Headless runs of both models: the trace is written chunk by chunk to <output>.trace.<ext> and the summary
+# statistics to <output>.summary.<ext> (Parquet with pyarrow, NPZ otherwise), without building a DataFrame.
+#   python batch_runner.py gas --cars 10000000 --seed 1 --output runs/gas
+#   python batch_runner.py hospital -N 6 -M 30 --days 10000000 --replications 30 --output runs/hospital
+
+def show_progress(done, total):
+    # Progress on stderr, only when someone is watching
+    if sys.stderr.isatty():
+        print(f"\r{done:,}/{total:,} ({done / total:.0%})", end="" if done < total else "\n", file=sys.stderr)
+
+def table_printer(to_table):
+    # Trace sink printing each chunk with to_string (the header only once, fixed column widths so the chunks
+    # line up); opt-in, it is slow on large runs
+    printed = []
+    def print_chunk(chunk):
+        table = to_table(chunk)
+        widths = [max(len(str(col)), 12) for col in table.columns]
+        text = table.to_string(index=False, col_space=widths)
+        print(text.split("\n", 1)[1] if printed else text)
+        printed.append(True)
+    return print_chunk
+
+def combined_sink(sinks):
+    sinks = [sink for sink in sinks if sink is not None]
+    def write(chunk):
+        for sink in sinks:
+            sink(chunk)
+    return write
+
+def output_paths(output, format):
+    extension = formats[format]
+    return f"{output}.trace{extension}", f"{output}.summary{extension}"
+
+def run_gas(args):
+    trace_path, summary_path = output_paths(args.output, args.format)
+    writer = None if args.no_trace else ColumnarWriter(trace_path, args.format)
+    # The engine's int64 columns are written at the trace's small integer widths
+    compact_writer = (lambda chunk: writer(gas_station.compact_chunk(chunk))) if writer is not None else None
+    printer = table_printer(gas_station.batch_to_table) if args.print_table else None
+    try:
+        summary = gas_station.simulate_summary(args.cars, seed=args.seed, chunk_size=args.chunk_size,
+                                               trace_sink=combined_sink([compact_writer, printer]),
+                                               progress=show_progress,
+                                               servers=args.servers, relative_precision=args.relative_precision)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # One summary row per pump; with replications, the mean and 95% CI half-width of each metric as well
+    run_summary = summary.summary()
+    columns = {"Pump": np.array(gas_station.pumps)}
+    for metric in gas_station.summary_metrics:
+        columns[metric] = np.array([run_summary[metric][pump] for pump in gas_station.pumps])
+    columns["Servers"] = np.array(args.servers)
+    steady_state = summary.steady_state()
+    columns["Steady State Wait"] = np.array([steady_state[pump]["mean"] if steady_state[pump] else np.nan
+                                             for pump in gas_station.pumps])
+    columns["Steady State Wait ±"] = np.array([steady_state[pump]["half_width"] if steady_state[pump] else np.nan
+                                               for pump in gas_station.pumps])
+    columns["Warm-up Cars"] = np.array([steady_state[pump]["warmup"] if steady_state[pump] else 0
+                                        for pump in gas_station.pumps])
+    columns["Trimmed Cars"] = np.array([steady_state[pump]["trimmed"] if steady_state[pump] else 0
+                                        for pump in gas_station.pumps])
+    columns["MSER Batch Size"] = np.array([steady_state[pump]["batch_size"] if steady_state[pump] else 0
+                                           for pump in gas_station.pumps])
+    extra_pump = None
+    if args.what_if_runs:
+        # Reduction in the overall mean wait from one more pump of each type (common random numbers)
+        extra_pump = gas_station.evaluate_extra_pump(summary.cars, args.what_if_runs, seed=args.seed,
+                                                     servers=args.servers, progress=show_progress)
+        columns["Extra Pump Reduction"] = np.array([extra_pump["reductions"][pump][0] for pump in gas_station.pumps])
+        columns["Extra Pump Reduction ±"] = np.array([extra_pump["reductions"][pump][1] for pump in gas_station.pumps])
+    stats = gas_station.get_statistics(summary, extra_pump, steady_state=args.steady_state)
+    if args.replications > 1:
+        aggregate = gas_station.run_replications(summary.cars, args.replications, seed=args.seed, progress=show_progress,
+                                                 servers=args.servers, antithetic=args.antithetic)
+        for metric in gas_station.summary_metrics:
+            columns[f"{metric} mean"] = np.array([aggregate[metric][pump][0] for pump in gas_station.pumps])
+            columns[f"{metric} ±"] = np.array([aggregate[metric][pump][1] for pump in gas_station.pumps])
+        reduced = [aggregate["Reduced Wait"][pump] for pump in gas_station.pumps]
+        columns["Reduced Average Wait"] = np.array([entry["estimate"][0] for entry in reduced])
+        columns["Reduced Average Wait ±"] = np.array([entry["estimate"][1] for entry in reduced])
+        columns["Equivalent Plain Runs"] = np.array([entry["plain_runs"] for entry in reduced])
+        stats += gas_station.format_replications(aggregate, args.replications, section=7 if extra_pump else 6)
+    write_columns(summary_path, columns, args.format)
+
+    print(stats)
+    report_outputs(writer, trace_path, summary_path)
+
+def run_hospital(args):
+    trace_path, summary_path = output_paths(args.output, args.format)
+    writer = None if args.no_trace else ColumnarWriter(trace_path, args.format)
+    if args.print_table:
+        import pandas as pd
+        printer = table_printer(lambda chunk: pd.DataFrame(chunk, columns=hospital.columns))
+    else:
+        printer = None
+    sink = combined_sink([writer, printer])
+    summary = hospital.InventorySummary()
+    try:
+        for chunk in hospital.simulate_hospital_chunks(args.N, args.M, max_days=args.days,
+                                                       days_per_cycle=args.days_per_cycle, seed=args.seed,
+                                                       chunk_size=args.chunk_size,
+                                                       first_floor_inventory=args.first_floor):
+            summary.update(chunk)
+            sink(chunk)
+            show_progress(summary.days, args.days)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # One summary row for the (N, M) policy; with replications, the mean and 95% CI half-width of each metric as well
+    metrics = summary.metrics()
+    columns = {"N": np.array([args.N]), "M": np.array([args.M]), "Days": np.array([args.days])}
+    for metric in hospital.policy_metrics:
+        columns[metric] = np.array([metrics[metric]])
+    stats = "--- Policy Metrics ---\n" + "".join(
+        f"{metric}: {value}\n" if isinstance(value, int) else f"{metric}: {value:.2f}\n" for metric, value in metrics.items()
+    )
+    if args.replications > 1:
+        results = hospital.policy_grid_search([args.N], [args.M], replications=args.replications, max_days=args.days,
+                                              days_per_cycle=args.days_per_cycle, seed=args.seed,
+                                              first_floor_inventory=args.first_floor)
+        stats += f"\nReplications ({args.replications} runs, mean ± 95% CI):\n"
+        for metric in hospital.policy_metrics:
+            mean, half_width = float(results[metric].iloc[0]), float(results[f"{metric} ±"].iloc[0])
+            columns[f"{metric} mean"] = np.array([mean])
+            columns[f"{metric} ±"] = np.array([half_width])
+            stats += f"   {metric}: {mean:.3f} ± {half_width:.3f}\n"
+    write_columns(summary_path, columns, args.format)
+
+    print(stats)
+    report_outputs(writer, trace_path, summary_path)
+
+def report_outputs(writer, trace_path, summary_path):
+    if writer is not None:
+        print(f"Trace: {trace_path} ({writer.rows:,} rows in {writer.chunks} chunks)")
+    print(f"Summary: {summary_path}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the simulation models without the GUI")
+    subparsers = parser.add_subparsers(dest="model", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--seed", type=int, default=None)
+    common.add_argument("--replications", type=int, default=1,
+                        help="independent replications for the confidence intervals in the summary")
+    common.add_argument("--output", default=None, help="output path prefix (default: the model name)")
+    common.add_argument("--format", choices=["auto", *formats], default="auto",
+                        help="auto = parquet when pyarrow is installed, npz otherwise")
+    common.add_argument("--chunk-size", type=int, default=2**16, help="rows simulated and written per chunk")
+    common.add_argument("--no-trace", action="store_true", help="write the summary only")
+    common.add_argument("--print-table", action="store_true", help="also print the trace as text (slow for large runs)")
+
+    gas = subparsers.add_parser("gas", parents=[common], help="gas station model")
+    gas.add_argument("--cars", type=int, required=True)
+    gas.add_argument("--servers", type=int, nargs=3, default=list(gas_station.default_servers),
+                     metavar=("95", "90", "GAS"), help="parallel pumps per fuel type")
+    gas.add_argument("--antithetic", action="store_true",
+                     help="run each replication as a pair on mirrored random numbers (variance reduction)")
+    gas.add_argument("--steady-state", action="store_true",
+                     help="print the average waits with the warm-up dropped and batch-means CIs")
+    gas.add_argument("--relative-precision", type=float, default=None,
+                     help="stop before --cars once the steady-state CI of the mean wait is within this fraction of it")
+    gas.add_argument("--what-if-runs", type=int, default=0,
+                     help="paired runs for the extra-pump what-if (0 = skip, at least 2 otherwise)")
+
+    hospital_model = subparsers.add_parser("hospital", parents=[common], help="hospital inventory model")
+    hospital_model.add_argument("-N", type=int, default=6, help="review period")
+    hospital_model.add_argument("-M", type=int, default=30, help="basement capacity")
+    hospital_model.add_argument("--days", type=int, required=True)
+    hospital_model.add_argument("--days-per-cycle", type=int, default=6)
+    hospital_model.add_argument("--first-floor", type=int, default=4, help="first-floor stock before day 1")
+
+    args = parser.parse_args(argv)
+    if args.seed is not None and args.seed < 0:
+        parser.error("--seed must not be negative")
+    if args.replications <= 0:
+        parser.error("--replications must be positive")
+    if args.chunk_size <= 0:
+        parser.error("--chunk-size must be positive")
+    if args.model == "gas":
+        if args.cars <= 0:
+            parser.error("--cars must be positive")
+        if min(args.servers) <= 0:
+            parser.error("--servers must be positive")
+        if args.relative_precision is not None and args.relative_precision <= 0:
+            parser.error("--relative-precision must be positive")
+        if args.what_if_runs == 1 or args.what_if_runs < 0:
+            parser.error("--what-if-runs must be 0 or at least 2")
+        args.servers = tuple(args.servers)
+    elif args.model == "hospital":
+        if args.days <= 0:
+            parser.error("--days must be positive")
+        if args.N <= 0:
+            parser.error("-N must be positive")
+        if args.M < 0:
+            parser.error("-M must not be negative")
+        if args.days_per_cycle <= 0:
+            parser.error("--days-per-cycle must be positive")
+        if args.first_floor < 0:
+            parser.error("--first-floor must not be negative")
+    args.format = resolve_format(args.format)
+    if args.output is None:
+        args.output = args.model
+    if args.model == "gas":
+        run_gas(args)
+    elif args.model == "hospital":
+        run_hospital(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+import gas_station
+import hospital
+from sampling import DiscreteSampler
+from trace_store import TraceStore
+
+#------------------------------------------------------------------------------------------------------------------------------------
+# Gas station: scalar simulate() loop vs simulate_batch()
+
+def check_gas_batch_matches_scalar(n_cars, seed):
+    # Same seed must give the same table and metrics on both paths
+    state = gas_station.simulate(n_cars, seed=seed, print_table=False)
+    scalar = state.trace.columns()
+    batch = gas_station.simulate_batch(n_cars, seed=seed)
+    for col in gas_station.trace_dtypes:
+        if batch[col].tolist() != scalar[col].tolist():
+            raise AssertionError(f"batch column {col!r} differs from scalar simulate()")
+    if not state.table().equals(gas_station.batch_to_table(batch)):
+        raise AssertionError("batch table differs from scalar simulate()")
+    for code, pump in enumerate(gas_station.pumps):
+        on_pump = batch["pump"] == code
+        assert batch["wait"][on_pump].tolist() == state.waiting_times[pump].tolist()
+        assert batch["queue_length"][on_pump].tolist() == state.queue_lengths[pump].tolist()
+        assert int(batch["idle_time"][on_pump].sum()) == state.idle_times[pump]
+
+def time_call(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def bench_gas_batch(sizes, max_scalar_cars, seed):
+    check_gas_batch_matches_scalar(min(sizes), seed)
+    print(f"batch == scalar for {min(sizes)} cars (seed {seed})")
+    print(f"{'cars':>10} {'scalar s':>10} {'batch s':>10} {'speedup':>9} {'batch cars/s':>14}")
+    for n_cars in sizes:
+        batch_seconds = time_call(gas_station.simulate_batch, n_cars, seed=seed)
+        if n_cars <= max_scalar_cars:
+            scalar_seconds = time_call(gas_station.simulate, n_cars, seed=seed, print_table=False)
+            scalar_text = f"{scalar_seconds:10.3f}"
+            speedup_text = f"{scalar_seconds / batch_seconds:8.1f}x"
+        else:
+            scalar_text, speedup_text = f"{'skipped':>10}", f"{'-':>9}"
+        print(f"{n_cars:>10} {scalar_text} {batch_seconds:10.3f} {speedup_text} {n_cars / batch_seconds:14,.0f}")
+
+#------------------------------------------------------------------------------------------------------------------------------------
+# Gas station: append-only pump lists (the old queue model) vs heaps of pending service ends
+
+def legacy_list_queues(clock, category, service_time, random_balk):
+    # The pre-deque model: cars are never removed, so len() counts every car the pump ever served
+    # Same per-car outputs as _run_queues, so only the queue structure differs
+    queues = [[], [], []]
+    last_end = [0, 0, 0]
+    pump_list, start_list, length_list, idle_list = [], [], [], []
+    for clock_time, cat, service, balk in zip(clock.tolist(), category.tolist(), service_time.tolist(), random_balk.tolist()):
+        if cat == 0:
+            p = 0
+        elif cat == 1:
+            p = 0 if len(queues[1]) > 3 and balk < 0.6 else 1
+        else:
+            p = 1 if len(queues[2]) > 4 and balk < 0.4 else 2
+        queue = queues[p]
+        start = max(clock_time, queue[-1][2] if queue else 0)
+        queue.append((clock_time, service, start + service))
+        pump_list.append(p)
+        start_list.append(start)
+        length_list.append(len(queue))
+        idle_list.append(start - last_end[p])
+        last_end[p] = start + service
+    return max(length_list)
+
+def pending_queues(clock, category, service_time, random_balk):
+    queue_state = gas_station.QueueState()
+    queue_length = gas_station._run_queues(clock, category, service_time, random_balk, queue_state)[2]
+    return int(queue_length.max())
+
+def measure(func, *args):
+    # Wall time of a plain call, then peak traced memory of a second call
+    seconds = time_call(func, *args)
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+def bench_gas_queues(sizes, seed):
+    print(f"{'cars':>10} {'list s':>8} {'list MB':>9} {'list max q':>11} {'heap s':>8} {'heap MB':>9} {'heap max q':>12}")
+    for n_cars in sizes:
+        _, _, _, random_balk, _, clock, category, service_time = gas_station.draw_chunk(gas_station.make_streams(seed), n_cars)
+        inputs = (clock, category, service_time, random_balk)
+        list_seconds, list_peak, list_max = measure(legacy_list_queues, *inputs)
+        pending_seconds, pending_peak, pending_max = measure(pending_queues, *inputs)
+        print(f"{n_cars:>10} {list_seconds:8.2f} {list_peak / 2**20:9.1f} {list_max:>11} "
+              f"{pending_seconds:8.2f} {pending_peak / 2**20:9.1f} {pending_max:>12}")
+
+#------------------------------------------------------------------------------------------------------------------------------------
+# Hospital: simulate_hospital_inventory() vs simulate_hospital_batch()
+
+def check_hospital_batch_matches_scalar(max_days, seed):
+    # Both engines refill the first floor only with what the basement holds, so M = 5 runs out of stock
+    for N, M in ((6, 30), (3, 12), (1, 5)):
+        scalar = hospital.simulate_hospital_inventory(N, M, max_days=max_days, seed=seed)
+        for use_numba in (True, False):
+            batch = hospital.simulate_hospital_batch(N, M, max_days=max_days, seed=seed, use_numba=use_numba)
+            for col in hospital.columns:
+                if batch[col].tolist() != scalar[col].tolist():
+                    raise AssertionError(f"batch column {col!r} differs from simulate_hospital_inventory()")
+
+def bench_hospital_batch(sizes, max_scalar_days, N, M, seed):
+    check_hospital_batch_matches_scalar(min(sizes), seed)
+    hospital.simulate_hospital_batch(N, M, max_days=10, seed=seed)  # Numba compiles on first use
+    has_numba = hospital.compiled_inventory_recurrence() is not None
+    print(f"batch == scalar for {min(sizes)} days (seed {seed}); numba {'on' if has_numba else 'not installed'}")
+    print(f"{'days':>10} {'scalar days/s':>14} {'batch py days/s':>16} {'batch numba days/s':>19}")
+    for days in sizes:
+        rates = []
+        if days <= max_scalar_days:
+            rates.append(days / time_call(hospital.simulate_hospital_inventory, N, M, max_days=days, seed=seed))
+        else:
+            rates.append(None)
+        rates.append(days / time_call(hospital.simulate_hospital_batch, N, M, max_days=days, seed=seed, use_numba=False))
+        if has_numba:
+            rates.append(days / time_call(hospital.simulate_hospital_batch, N, M, max_days=days, seed=seed))
+        else:
+            rates.append(None)
+        print(f"{days:>10} " + " ".join(f"{rate:>{width},.0f}" if rate else f"{'-':>{width}}"
+                                        for rate, width in zip(rates, (14, 16, 19))))
+
+#------------------------------------------------------------------------------------------------------------------------------------
+# Traces: one dict per row (the old scalar tables) vs TraceStore typed columns, on the same simulate_batch rows
+
+def legacy_dict_rows(rows):
+    import pandas as pd
+    table = []
+    for values in zip(*rows.values()):
+        table.append(dict(zip(rows, values)))
+    start = time.perf_counter()
+    frame = pd.DataFrame(table)
+    return table, frame, time.perf_counter() - start
+
+def trace_store_rows(rows):
+    trace = TraceStore(gas_station.trace_dtypes)
+    appenders = trace.appenders()
+    for values in zip(*rows.values()):
+        for append, value in zip(appenders, values):
+            append(value)
+    start = time.perf_counter()
+    frame = gas_station.batch_to_table(trace.columns())
+    return trace, frame, time.perf_counter() - start
+
+def bench_trace_memory(sizes, seed):
+    print(f"{'rows':>10} {'dict s':>8} {'dict B/row':>11} {'to frame s':>11} "
+          f"{'store s':>8} {'store B/row':>12} {'to frame s':>11}")
+    for n_rows in sizes:
+        batch = gas_station.simulate_batch(n_rows, seed=seed)
+        rows = {key: batch[key].tolist() for key in gas_station.trace_dtypes}  # Python ints, as the scalar loop has
+        line = f"{n_rows:>10}"
+        for build in (legacy_dict_rows, trace_store_rows):
+            # Peak covers the rows and the DataFrame built from them
+            seconds, peak, (_, _, frame_seconds) = measure(build, rows)
+            line += f" {seconds:8.2f} {peak / n_rows:11.0f} {frame_seconds:11.3f}"
+        print(line)
+
+#------------------------------------------------------------------------------------------------------------------------------------
+# Samplers: the original linear-scan mappers vs DiscreteSampler lookup tables and the alias method
+
+def sampler_cases():
+    # (name, scalar mapper of a random number, batched mapper, draw, batched draw, table sampler)
+    cases = []
+    for name, probabilities, values, sampler in (
+        ("gas arrival", gas_station.arrival_probabilities, gas_station.arrival_values, gas_station.arrival_sampler),
+        ("gas C service", gas_station.c_service_probs, gas_station.c_service_values, gas_station.c_service_sampler),
+    ):
+        intervals = gas_station.get_cumulative_intervals(probabilities)
+        cases.append((name, lambda number, intervals=intervals, values=values:
+                      gas_station.map_random_to_value(number, intervals, values),
+                      lambda numbers, intervals=intervals, values=values:
+                      gas_station.map_random_array(numbers, intervals, values),
+                      gas_station.draw_random_number, gas_station.draw_random_numbers, sampler))
+    for name, mapper, ranges, sampler in (
+        ("hospital rooms", hospital.map_rooms_occupied, hospital.room_occupancy_ranges, hospital.room_sampler),
+        ("hospital lead time", hospital.map_lead_time, hospital.lead_time_ranges, hospital.lead_time_sampler),
+    ):
+        cases.append((name, mapper, lambda numbers, ranges=ranges: hospital.map_ranges_array(numbers, ranges),
+                      hospital.draw_random_number, hospital.draw_random_numbers, sampler))
+    return cases
+
+def bench_samplers(scalar_draws, batch_draws, seed):
+    print(f"draws/s: {scalar_draws:,} scalar draws, {batch_draws:,} batched")
+    print(f"{'distribution':<20} {'scan':>12} {'table':>12} {'alias':>12} {'array scan':>12} {'array table':>12} "
+          f"{'array alias':>12}")
+    for name, mapper, array_mapper, draw, draw_array, sampler in sampler_cases():
+        alias = DiscreteSampler(sampler.values, sampler.probabilities, method="alias")
+        rng = np.random.default_rng(seed)
+        # The table must give the original mapping for every random number, bar the float-rounding edge of the scan
+        numbers = np.arange(sampler.offset, sampler.offset + sampler.resolution)
+        differing = int((sampler.lookup_array(numbers) != array_mapper(numbers)).sum())
+        timings = [
+            time_call(lambda: [mapper(draw(rng)) for _ in range(scalar_draws)]) / scalar_draws,
+            time_call(lambda: [sampler.sample(rng=rng) for _ in range(scalar_draws)]) / scalar_draws,
+            time_call(lambda: [alias.sample(rng=rng) for _ in range(scalar_draws)]) / scalar_draws,
+            time_call(lambda: array_mapper(draw_array(rng, batch_draws))) / batch_draws,
+            time_call(lambda: sampler.sample(batch_draws, rng=rng)) / batch_draws,
+            time_call(lambda: alias.sample(batch_draws, rng=rng)) / batch_draws,
+        ]
+        note = f"  ({differing} of {sampler.resolution} numbers map differently)" if differing else ""
+        print(f"{name:<20} " + " ".join(f"{1 / seconds:12,.0f}" for seconds in timings) + note)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the simulation engines")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    gas_batch = subparsers.add_parser("gas-batch", help="scalar simulate() vs simulate_batch()")
+    gas_batch.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**6, 10**7])
+    gas_batch.add_argument("--max-scalar-cars", type=int, default=10**7,
+                           help="skip the scalar loop above this many cars (it keeps the whole table, ~40 B per car)")
+    gas_batch.add_argument("--seed", type=int, default=12345)
+
+    gas_queues = subparsers.add_parser("gas-queues", help="append-only pump lists vs heaps of pending service ends")
+    gas_queues.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6, 5 * 10**6])
+    gas_queues.add_argument("--seed", type=int, default=12345)
+
+    hospital_batch = subparsers.add_parser("hospital-batch", help="simulate_hospital_inventory() vs simulate_hospital_batch()")
+    hospital_batch.add_argument("--sizes", type=int, nargs="+", default=[10**4, 10**6, 10**7])
+    hospital_batch.add_argument("--max-scalar-days", type=int, default=10**6)
+    hospital_batch.add_argument("-N", type=int, default=6, help="review period")
+    hospital_batch.add_argument("-M", type=int, default=30, help="basement capacity")
+    hospital_batch.add_argument("--seed", type=int, default=12345)
+
+    trace_memory = subparsers.add_parser("trace-memory", help="per-row dicts vs TraceStore typed columns")
+    trace_memory.add_argument("--sizes", type=int, nargs="+", default=[10**5, 10**6])
+    trace_memory.add_argument("--seed", type=int, default=12345)
+
+    samplers = subparsers.add_parser("samplers", help="linear-scan mappers vs lookup-table and alias samplers")
+    samplers.add_argument("--scalar-draws", type=int, default=10**5)
+    samplers.add_argument("--batch-draws", type=int, default=10**7)
+    samplers.add_argument("--seed", type=int, default=12345)
+
+    args = parser.parse_args(argv)
+    if args.benchmark == "gas-batch":
+        bench_gas_batch(args.sizes, args.max_scalar_cars, args.seed)
+    elif args.benchmark == "gas-queues":
+        bench_gas_queues(args.sizes, args.seed)
+    elif args.benchmark == "hospital-batch":
+        bench_hospital_batch(args.sizes, args.max_scalar_days, args.N, args.M, args.seed)
+    elif args.benchmark == "trace-memory":
+        bench_trace_memory(args.sizes, args.seed)
+    elif args.benchmark == "samplers":
+        bench_samplers(args.scalar_draws, args.batch_draws, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import zipfile
+
+import numpy as np
+
+# Columnar files for simulation traces and summaries: Parquet when pyarrow is installed, NPZ otherwise.
+# Columns are dicts of name -> 1-D NumPy array; writers take them chunk by chunk so a run is never held whole.
+
+formats = {"parquet": ".parquet", "npz": ".npz"}
+
+def has_pyarrow():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def resolve_format(format="auto"):
+    # "auto" picks Parquet if pyarrow can be imported, NPZ otherwise
+    if format == "auto":
+        return "parquet" if has_pyarrow() else "npz"
+    if format not in formats:
+        raise ValueError(f"unknown format {format!r}, expected one of auto, {', '.join(formats)}")
+    return format
+
+def format_of(path):
+    for format, extension in formats.items():
+        if str(path).endswith(extension):
+            return format
+    raise ValueError(f"cannot tell the format of {path!r} from its extension")
+
+class ColumnarWriter:
+    # Appends chunks of columns to one file: a Parquet row group per chunk, or one .npy member per column
+    # and chunk in an NPZ archive ("<column>/<chunk>.npy", read back whole by read_columns).
+    # Instances are callable, so they can be passed as a trace_sink.
+    def __init__(self, path, format=None):
+        self.path = path
+        self.format = format or format_of(path)
+        self.chunks = 0
+        self.rows = 0
+        self._parquet = None
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) if self.format == "npz" else None
+
+    def write(self, chunk):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pydict({name: pa.array(np.asarray(values)) for name, values in chunk.items()})
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            for name, values in chunk.items():
+                with self._zip.open(f"{name}/{self.chunks:06d}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.ascontiguousarray(values), allow_pickle=False)
+        self.chunks += 1
+        self.rows += len(next(iter(chunk.values()))) if chunk else 0
+
+    __call__ = write
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_columns(path, columns, format=None):
+    # Whole (small) table in one go, e.g. a run summary
+    with ColumnarWriter(path, format) as writer:
+        writer.write(columns)
+
+def read_columns(path):
+    # Dict of name -> concatenated column for a file written by ColumnarWriter
+    if format_of(path) == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+    parts = {}
+    with np.load(path, allow_pickle=False) as archive:
+        for key in archive.files:  # Members are in the order they were written
+            name = key.rsplit("/", 1)[0]
+            parts.setdefault(name, []).append(archive[key])
+    return {name: np.concatenate(chunks) for name, chunks in parts.items()}
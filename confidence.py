@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+
+# Two-sided 95% Student t critical values for 1..30 degrees of freedom
+t_critical_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def t_critical(degrees_of_freedom):
+    # 95% two-sided critical value, normal approximation past 30 degrees of freedom
+    if degrees_of_freedom <= 30:
+        return t_critical_95[degrees_of_freedom - 1]
+    return 1.96
+
+def confidence_interval(values):
+    # Mean and 95% confidence half-width of independent observations
+    values = np.asarray(values, dtype=float)
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, float("nan")
+    half_width = t_critical(len(values) - 1) * float(values.std(ddof=1)) / math.sqrt(len(values))
+    return mean, half_width
+
+def control_variate_interval(values, controls, control_means):
+    # Mean and 95% confidence half-width of values adjusted by controls whose expectations are known:
+    # least-squares fit of values on the centered controls, the intercept is the estimate.
+    # controls has one row per observation; falls back to confidence_interval when there are too few observations
+    values = np.asarray(values, dtype=float)
+    centered = np.asarray(controls, dtype=float).reshape(len(values), -1) - np.asarray(control_means, dtype=float)
+    degrees_of_freedom = len(values) - centered.shape[1] - 1
+    if degrees_of_freedom < 1:
+        return confidence_interval(values)
+    design = np.column_stack([np.ones(len(values)), centered])
+    coefficients = np.linalg.lstsq(design, values, rcond=None)[0]
+    residuals = values - design @ coefficients
+    variance = float(residuals @ residuals) / degrees_of_freedom
+    standard_error = math.sqrt(variance * np.linalg.pinv(design.T @ design)[0, 0])
+    return float(coefficients[0]), t_critical(degrees_of_freedom) * standard_error
@@ -0,0 +1,834 @@
+import math
+from array import array
+from heapq import heappop, heappush, heapreplace
+
+import numpy as np
+
+from confidence import confidence_interval, control_variate_interval, t_critical
+from online_stats import FixedHistogram, RunningStats
+from progress import check_progress, pool_results
+from queueing import allen_cunneen_wait, distribution_moments
+from run_cache import same_layout
+from sampling import DiscreteSampler, max_resolution, table_resolution
+from steady_state import BatchSeries, precision_reached, steady_state_interval
+from trace_store import TraceStore, frame_from_columns
+#------------------------------------------------------------------------------------------------------------------------------------
+# Parameters
+arrival_probabilities = [0.17, 0.23, 0.25, 0.35]  # For 0, 1, 2, 3 minutes
+a_and_b_service_probs = [0.2, 0.3, 0.5]  # For 1, 2, 3 minutes
+c_service_probs = [0.2, 0.5, 0.3]  # For 3, 5, 7 minutes
+categories = ["A", "B", "C"]
+category_probs = [0.2, 0.35, 0.45]
+pumps = ["95 Octane", "90 Octane", "Gas"]
+
+# Parallel servers (pumps) per fuel type, in the order of `pumps`; cars of a type form one FIFO line
+default_servers = (1, 1, 1)
+
+# Cars in the system at their own pump above which B cars may go to 95 Octane and C cars to 90 Octane,
+# for a single server; every extra server adds one (the line a driver sees is what balking depends on)
+b_balk_limit = 3
+c_balk_limit = 4
+
+arrival_values = [0, 1, 2, 3]
+a_and_b_service_values = [1, 2, 3]
+c_service_values = [3, 5, 7]
+
+# Random numbers are int(u * random_resolution), 0-99 while the probabilities have two decimals; each distribution
+# maps them to values with a lookup table (categories as codes 0-2 into categories). The simulation table records
+# these numbers, so the alias method (which has none) is not an option here
+random_resolution = table_resolution(arrival_probabilities, category_probs, a_and_b_service_probs, c_service_probs)
+if random_resolution is None:
+    raise ValueError(f"gas station probabilities must be whole multiples of 1/{max_resolution:,} "
+                     "for the random-number tables")
+random_dtype = np.int16 if random_resolution < 2**15 else np.int32
+arrival_sampler = DiscreteSampler(arrival_values, arrival_probabilities, method="table", resolution=random_resolution)
+category_sampler = DiscreteSampler([0, 1, 2], category_probs, method="table", resolution=random_resolution)
+a_and_b_service_sampler = DiscreteSampler(a_and_b_service_values, a_and_b_service_probs, method="table",
+                                          resolution=random_resolution)
+c_service_sampler = DiscreteSampler(c_service_values, c_service_probs, method="table", resolution=random_resolution)
+# Service time by [category code, random service number], one gather for a whole chunk
+service_table = np.stack([a_and_b_service_sampler.table, a_and_b_service_sampler.table, c_service_sampler.table])
+
+# Known means and variances of the input distributions (control variates and the analytic cross-check)
+inter_arrival_mean, inter_arrival_variance = distribution_moments(arrival_probabilities, arrival_values)
+a_and_b_service_mean, _ = distribution_moments(a_and_b_service_probs, a_and_b_service_values)
+c_service_mean, _ = distribution_moments(c_service_probs, c_service_values)
+service_mean = (category_probs[0] + category_probs[1]) * a_and_b_service_mean + category_probs[2] * c_service_mean
+
+# Per-car trace shared by both engines (simulate_batch keys): small integer dtypes, category and pump as codes 0-2
+# into categories and pumps, and one pump column with its service start / time / end
+trace_dtypes = {
+    "car_number": np.int32, "random_category": random_dtype, "category": np.int8, "random_arrival": random_dtype,
+    "inter_arrival": np.int8, "clock": np.int32, "random_service": random_dtype, "pump": np.int8,
+    "service_start": np.int32, "service_time": np.int8, "service_end": np.int32,
+}
+trace_names = {
+    "car_number": "Car Number", "random_category": "Random Category Number", "category": "Category",
+    "random_arrival": "Random Arrival Time", "inter_arrival": "Time Between Arrivals", "clock": "Time in Clock",
+    "random_service": "Random Service Time", "pump": "Pump", "service_start": "Service Start",
+    "service_time": "Service Time", "service_end": "Service End",
+}
+trace_labels = {"category": categories, "pump": pumps}
+
+# simulate_chunks columns beyond the trace, at the same compact widths for writing them out
+chunk_dtypes = {**trace_dtypes, "wait": np.int32, "queue_length": np.int32, "idle_time": np.int32}
+
+def compact_chunk(chunk):
+    # simulate_chunks columns cast to chunk_dtypes (the engine works in int64)
+    return {key: np.asarray(values, dtype=chunk_dtypes[key]) for key, values in chunk.items()}
+
+# Columns of the simulation table, in display order
+columns = list(trace_names.values())
+
+# Linear-scan mappers of the original model, kept for reference and the sampler benchmark
+def get_cumulative_intervals(probabilities): #[0.17, 0.23, 0.25, 0.35]
+                                             #[17,40,65,100]
+    #Convert probabilities to cumulative intervals
+    cumulative = []
+    total = 0
+    for p in probabilities:
+        total += p
+        cumulative.append(total * 100)  # Convert to percentage scale (0-100)
+    return cumulative
+
+def map_random_to_value(random_num, cumulative_intervals, values):
+    #Map a random number (0-100) to a value based on cumulative intervals.
+    for i, upper_bound in enumerate(cumulative_intervals):
+        if random_num < upper_bound:
+            return values[i]
+    return values[-1]  # Default to last value if no match
+
+def map_random_array(random_nums, cumulative_intervals, values):
+    #Vectorized map_random_to_value: first interval whose upper bound is above each number
+    index = np.searchsorted(np.asarray(cumulative_intervals), random_nums, side="right")
+    return np.asarray(values)[np.minimum(index, len(values) - 1)]
+
+def make_streams(seed=None, antithetic=False):
+    #One independent stream each for arrivals, categories, service times and balking,
+    #so the scalar and batch engines consume exactly the same numbers for a seed.
+    #antithetic=True gives the mirrored streams (1 - u for every uniform u) of the same seed
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    streams = [np.random.default_rng(child) for child in seed_seq.spawn(4)]
+    return [AntitheticStream(rng) for rng in streams] if antithetic else streams
+
+class AntitheticStream:
+    # Generator wrapper returning the antithetic uniforms of rng; still in [0, 1) so the mappings are unchanged
+    one_below = np.nextafter(1.0, 0.0)
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def random(self, size=None):
+        return self.one_below - self.rng.random(size)
+
+def draw_random_number(rng):
+    # Random number 0-99 (0 to random_resolution - 1) from a uniform draw
+    return int(rng.random() * random_resolution)
+
+def balk_limits(servers):
+    # [_, limit for B at 90 Octane, limit for C at Gas] for the given servers per pump
+    return [None, b_balk_limit + servers[1] - 1, c_balk_limit + servers[2] - 1]
+
+def draw_random_numbers(rng, n):
+    # Batched draw_random_number, same stream consumption as n scalar draws
+    return (rng.random(n) * random_resolution).astype(random_dtype)
+
+class SimulationState:
+    # Queues, metrics and table of one run, so several runs never share data
+    def __init__(self, servers=default_servers):
+        self.servers = tuple(servers)
+        # Queues for pumps: heap of the service ends of every car still in the system,
+        # and heap of the times each of the pump's servers is next free
+        self.pump_queues = {pump: [] for pump in pumps}
+        self.server_free = {pump: [0] * c for pump, c in zip(pumps, self.servers)}
+
+        # Metrics, one typed array entry per car
+        self.waiting_times = {pump: array("i") for pump in pumps}
+        self.queue_lengths = {pump: array("i") for pump in pumps}
+        self.service_times = {cat: array("b") for cat in categories}
+        self.idle_times = {pump: 0 for pump in pumps}
+        self.pump_last_end_time = {pump: 0 for pump in pumps}
+        self.waiting_cars = {pump: 0 for pump in pumps}
+        self.service_totals = {pump: 0 for pump in pumps}  # Sum and sum of squares of the service times at each pump
+        self.service_squares = {pump: 0 for pump in pumps}
+        self.wait_series = BatchSeries()  # Every car's wait in arrival order, for the warm-up and the stopping rule
+
+        # Simulation details, one row per car in compact columns (see table())
+        self.trace = TraceStore(trace_dtypes)
+
+        # Streams and clock where the run stopped, so simulate() can continue it to more cars
+        self.streams = None
+        self.time = 0
+
+    def table(self):
+        # Simulation table as a DataFrame over the trace columns (no copy)
+        return batch_to_table(self.trace.columns())
+
+    def figures(self):
+        # Aggregates behind get_statistics, computed from the full history
+        n_cars = len(self.trace)
+        total_time = max(self.pump_last_end_time.values())
+        return {
+            "cars": n_cars,
+            "pump_cars": {pump: len(times) for pump, times in self.waiting_times.items()},
+            "avg_service_times": {cat: (sum(times) / len(times) if times else 0) for cat, times in self.service_times.items()},
+            "avg_wait_times": {pump: (sum(times) / len(times) if times else 0) for pump, times in self.waiting_times.items()},
+            "overall_avg_wait": sum(sum(times) for times in self.waiting_times.values()) / n_cars,
+            "max_queue_lengths": {pump: max(lengths) if lengths else 0 for pump, lengths in self.queue_lengths.items()},
+            "prob_car_waits": {pump: (self.waiting_cars[pump] / n_cars) for pump in self.waiting_cars},
+            "idle_portions": {pump: (self.idle_times[pump] / (c * total_time)) for pump, c in zip(pumps, self.servers)},
+            "pump_service_moments": service_moments(self.service_totals, self.service_squares, self.waiting_times),
+        }
+
+    def wait_histograms(self, bins=10):
+        # (counts, edges) of the waiting times at every pump that served a car
+        return {pump: np.histogram(times, bins=bins) for pump, times in self.waiting_times.items() if times}
+
+    def steady_state(self, n_batches=20):
+        # {pump / "Overall": steady_state_interval of the waits, None if the run is too short}
+        series = {}
+        for pump, times in self.waiting_times.items():
+            series[pump] = BatchSeries()
+            series[pump].update_array(times)
+        series["Overall"] = self.wait_series
+        return {name: steady_state_interval(waits, n_batches) for name, waits in series.items()}
+
+def simulate(n_cars, seed=None, print_table=False, state=None, progress=None, cancel=None, progress_every=1000,
+             servers=default_servers, relative_precision=None):
+    # Run the scalar simulation into a fresh (or given) SimulationState and return it;
+    # progress(done, total) is called every progress_every cars, when cancel is also checked.
+    # With relative_precision, n_cars is an upper bound: the run stops at the first check where the steady-state
+    # CI of the overall mean wait is within that fraction of the mean (sequential stopping rule).
+    # A state from an earlier run is continued up to n_cars cars in total, on its own streams (seed is ignored)
+    if state is None:
+        state = SimulationState(servers)
+    if state.streams is None:
+        state.streams = make_streams(seed)
+    pump_95 = state.pump_queues["95 Octane"]
+    pump_90 = state.pump_queues["90 Octane"]
+    pump_gas = state.pump_queues["Gas"]
+    _, b_limit, c_limit = balk_limits(state.servers)
+    time = state.time
+    car_number = len(state.trace)
+    arrival_rng, category_rng, service_rng, balk_rng = state.streams
+    pump_codes = {pump: code for code, pump in enumerate(pumps)}
+    (append_car_number, append_random_category, append_category, append_random_arrival, append_inter_arrival,
+     append_clock, append_random_service, append_pump, append_service_start, append_service_time,
+     append_service_end) = state.trace.appenders()
+    arrival_time = arrival_sampler.lookup
+    category_code = category_sampler.lookup
+    a_and_b_service_time = a_and_b_service_sampler.lookup
+    c_service_time = c_service_sampler.lookup
+
+    while car_number < n_cars:
+        if car_number % progress_every == 0:
+            check_progress(car_number, n_cars, progress, cancel)
+            if relative_precision is not None and precision_reached(state.wait_series, relative_precision):
+                break
+
+        # Generate car arrival
+        random_arrival = draw_random_number(arrival_rng)
+        inter_arrival_time = arrival_time(random_arrival)
+        time += inter_arrival_time
+
+        # Cars whose service ended by now have left their pump
+        for queue in state.pump_queues.values():
+            while queue and queue[0] <= time:
+                heappop(queue)
+
+        random_category = draw_random_number(category_rng)
+        category = category_code(random_category)
+        car_category = categories[category]
+        random_service = draw_random_number(service_rng)
+        random_balk = balk_rng.random()  # Drawn for every car to keep the streams aligned
+
+        if car_category == "A":
+            service_time = a_and_b_service_time(random_service)
+            pump = "95 Octane"
+            queue = pump_95
+
+        elif car_category == "B":
+            service_time = a_and_b_service_time(random_service)
+            if len(pump_90) > b_limit and random_balk < 0.6:
+                pump = "95 Octane"
+                queue = pump_95
+            else:
+                pump = "90 Octane"
+                queue = pump_90
+
+        elif car_category == "C":
+            service_time = c_service_time(random_service)
+            if len(pump_gas) > c_limit and random_balk < 0.4:
+                pump = "90 Octane"
+                queue = pump_90
+            else:
+                pump = "Gas"
+                queue = pump_gas
+
+        # Record service start and end times, at the server that is free first
+        server_free = state.server_free[pump]
+        service_start = max(time, server_free[0])
+        service_end = service_start + service_time
+
+        # Update idle time
+        state.idle_times[pump] += service_start - server_free[0]
+        heapreplace(server_free, service_end)
+        state.pump_last_end_time[pump] = max(state.pump_last_end_time[pump], service_end)
+
+        # Join the queue
+        heappush(queue, service_end)
+
+        # waiting times and queue lengths
+        state.waiting_times[pump].append(service_start - time)
+        state.waiting_cars[pump] += 1 if service_start > time else 0
+        state.wait_series.update(service_start - time)
+        state.queue_lengths[pump].append(len(queue))
+
+        # service times
+        state.service_times[car_category].append(service_time)
+        state.service_totals[pump] += service_time
+        state.service_squares[pump] += service_time * service_time
+
+        # simulation details
+        append_car_number(car_number + 1)
+        append_random_category(random_category)
+        append_category(category)
+        append_random_arrival(random_arrival)
+        append_inter_arrival(inter_arrival_time)
+        append_clock(time)
+        append_random_service(random_service)
+        append_pump(pump_codes[pump])
+        append_service_start(service_start)
+        append_service_time(service_time)
+        append_service_end(service_end)
+
+        car_number += 1
+
+    state.time = time
+    check_progress(n_cars, n_cars, progress, cancel)
+
+    # Results
+    if print_table:
+        print(state.table().to_string(index=False))
+
+    return state
+
+def service_moments(totals, squares, counts):
+    # {pump: (mean, variance)} of the service times each pump gave, from their sums and sums of squares
+    moments = {}
+    for pump in pumps:
+        n = len(counts[pump]) if hasattr(counts[pump], "__len__") else counts[pump]
+        mean = totals[pump] / n if n else 0.0
+        moments[pump] = (mean, squares[pump] / n - mean * mean if n else 0.0)
+    return moments
+
+def analytic_wait_times(figures, servers=default_servers):
+    # {pump: (approximate mean wait, utilization)} with the Allen-Cunneen approximation (Kingman's formula for a
+    # single pump): the known arrival process thinned to the share of cars the pump got, and the service times it
+    # gave. Balking is state dependent rather than a random split, so expect it to overshoot close to saturation
+    arrival_scv = inter_arrival_variance / inter_arrival_mean ** 2
+    waits = {}
+    for pump, c in zip(pumps, servers):
+        share = figures["pump_cars"][pump] / figures["cars"]
+        mean, variance = figures["pump_service_moments"][pump]
+        if not share:
+            waits[pump] = (0.0, 0.0)
+            continue
+        # Each arrival goes to this pump with probability share: SCV of a thinned renewal process
+        pump_arrival_scv = share * arrival_scv + 1 - share
+        arrival_rate = share / inter_arrival_mean
+        waits[pump] = (allen_cunneen_wait(arrival_rate, mean, pump_arrival_scv, variance / mean ** 2, c),
+                       arrival_rate * mean / c)
+    return waits
+
+def get_statistics(state, extra_pump=None, steady_state=False):
+    # Compute and format statistics; state is a SimulationState or a summary-only StreamingSummary,
+    # extra_pump an evaluate_extra_pump result for section 6 (left out when None).
+    # steady_state adds the average waits with the warm-up dropped and batch-means CIs
+    figures = state.figures()
+    avg_service_times = figures["avg_service_times"]
+    avg_wait_times = figures["avg_wait_times"]
+    max_queue_lengths = figures["max_queue_lengths"]
+    prob_car_waits = figures["prob_car_waits"]
+    idle_portions = figures["idle_portions"]
+
+    stats = "--- Statistics ---\n"
+    stats += "1. Average Service Times:\n"
+    for cat, avg_time in avg_service_times.items():
+        stats += f"   Category {cat}: {avg_time:.2f} minutes\n"
+
+    stats += "\n2. Average Waiting Times (Allen-Cunneen approximation at utilization ρ in parentheses):\n"
+    analytic_waits = analytic_wait_times(figures, state.servers)
+    for pump, avg_wait in avg_wait_times.items():
+        analytic_wait, utilization = analytic_waits[pump]
+        stats += f"   {pump}: {avg_wait:.2f} minutes ({analytic_wait:.2f} at ρ = {utilization:.2f})\n"
+    stats += f"   Overall: {figures['overall_avg_wait']:.2f} minutes\n"
+    if steady_state:
+        stats += f"   Steady state over {figures['cars']:,} cars (MSER warm-up dropped, batch means, 95% CI):\n"
+        for name, estimate in state.steady_state().items():
+            if estimate is None:
+                stats += f"      {name}: too few cars for batch means\n"
+            else:
+                stats += (f"      {name}: {estimate['mean']:.2f} ± {estimate['half_width']:.2f} minutes "
+                          f"(MSER-{estimate['batch_size']}: {estimate['warmup']:,} warm-up cars dropped, "
+                          f"{estimate['trimmed']:,} more trimmed for equal batches)\n")
+
+    stats += "\n3. Maximum Queue Lengths:\n"
+    for pump, max_length in max_queue_lengths.items():
+        stats += f"   {pump}: {max_length} cars\n"
+
+    stats += "\n4. Probability that a car waits:\n"
+    for pump, prob in prob_car_waits.items():
+        stats += f"   {pump}: {prob:.2%}\n"
+
+    stats += "\n5. Portion of Idle Time:\n"
+    for pump, portion in idle_portions.items():
+        stats += f"   {pump}: {portion:.2%}\n"
+
+    if extra_pump is not None:
+        stats += format_extra_pump(extra_pump)
+
+    return stats
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Batch engine: all random numbers are drawn up front as arrays and mapped through the sampler lookup tables,
+# only the queue-dependent steps (pump choice and service start) run in a sequential pass.
+
+class QueueState:
+    # Pump state carried from one chunk of cars to the next
+    def __init__(self, servers=default_servers):
+        self.cars = 0
+        self.clock = 0
+        self.servers = tuple(servers)
+        self.pending = [[], [], []]  # Heaps of the service end times of the cars in system at each pump
+        self.server_free = [[0] * c for c in self.servers]  # Heaps of the times each server is next free
+
+def simulate_chunks(n_cars, seed=None, chunk_size=2**16, servers=default_servers, antithetic=False, resume=None):
+    # Yield simulate_batch columns chunk by chunk; each chunk continues the streams and queues of the last,
+    # so the concatenated chunks equal one simulate_batch call for the same seed.
+    # resume: (streams, queue_state) of an earlier run, continued up to n_cars cars in total
+    streams, queue_state = resume or (make_streams(seed, antithetic), QueueState(servers))
+    while queue_state.cars < n_cars:
+        yield _simulate_chunk(streams, min(chunk_size, n_cars - queue_state.cars), queue_state)
+
+def simulate_batch(n_cars, seed=None, servers=default_servers):
+    #Returns a dict of NumPy columns, one entry per car (category and pump as 0/1/2 codes)
+    return _simulate_chunk(make_streams(seed), n_cars, QueueState(servers))
+
+def _simulate_chunk(streams, n_cars, queue_state):
+    random_arrival, random_category, random_service, random_balk, inter_arrival, clock, category, service_time = \
+        draw_chunk(streams, n_cars, queue_state.clock)
+    pump, service_start, queue_length, idle_time = _run_queues(clock, category, service_time, random_balk, queue_state)
+
+    first_car = queue_state.cars + 1
+    queue_state.cars += n_cars
+    if n_cars:
+        queue_state.clock = int(clock[-1])
+
+    return {
+        "car_number": np.arange(first_car, first_car + n_cars),
+        "random_category": random_category,
+        "category": category,
+        "random_arrival": random_arrival,
+        "inter_arrival": inter_arrival,
+        "clock": clock,
+        "random_service": random_service,
+        "pump": pump,
+        "service_start": service_start,
+        "service_time": service_time,
+        "service_end": service_start + service_time,
+        "wait": service_start - clock,
+        "queue_length": queue_length,
+        "idle_time": idle_time,
+    }
+
+def draw_chunk(streams, n_cars, start_clock=0):
+    # Everything that does not depend on the queues: random numbers, arrival clock, categories, service times
+    arrival_rng, category_rng, service_rng, balk_rng = streams
+
+    random_arrival = draw_random_numbers(arrival_rng, n_cars)
+    random_category = draw_random_numbers(category_rng, n_cars)
+    random_service = draw_random_numbers(service_rng, n_cars)
+    random_balk = balk_rng.random(n_cars)
+
+    inter_arrival = arrival_sampler.lookup_array(random_arrival).astype(np.int8)
+    clock = start_clock + np.cumsum(inter_arrival, dtype=np.int64)
+    category = category_sampler.lookup_array(random_category).astype(np.int8)
+    service_time = service_table[category, random_service].astype(np.int8)
+
+    return random_arrival, random_category, random_service, random_balk, inter_arrival, clock, category, service_time
+
+def _run_queues(clock, category, service_time, random_balk, queue_state):
+    # Sequential pass over plain Python lists (much faster to iterate than NumPy scalars).
+    # Finished cars are popped lazily, just before a pump's length is needed; each car goes to the server
+    # of its pump that is free first.
+    pending = queue_state.pending
+    server_free = queue_state.server_free
+    _, b_limit, c_limit = balk_limits(queue_state.servers)
+    pump_list, start_list, length_list, idle_list = [], [], [], []
+    for time, cat, service, balk in zip(clock.tolist(), category.tolist(), service_time.tolist(), random_balk.tolist()):
+        if cat == 0:
+            p = 0
+        else:
+            queue = pending[cat]  # Own pump: B -> 90 Octane (1), C -> Gas (2)
+            while queue and queue[0] <= time:
+                heappop(queue)
+            if cat == 1:
+                p = 0 if len(queue) > b_limit and balk < 0.6 else 1
+            else:
+                p = 1 if len(queue) > c_limit and balk < 0.4 else 2
+        queue = pending[p]
+        while queue and queue[0] <= time:
+            heappop(queue)
+
+        servers = server_free[p]
+        previous_end = servers[0]
+        start = time if time > previous_end else previous_end
+        end = start + service
+        heapreplace(servers, end)
+        heappush(queue, end)
+
+        pump_list.append(p)
+        start_list.append(start)
+        length_list.append(len(queue))
+        idle_list.append(start - previous_end)
+
+    return (np.array(pump_list, dtype=np.int8), np.array(start_list, dtype=np.int64),
+            np.array(length_list, dtype=np.int64), np.array(idle_list, dtype=np.int64))
+
+def batch_to_table(result):
+    # Simulation table over simulate_batch (or trace) columns: arrays that already have the trace dtypes are used
+    # without copying, category and pump codes show as labels, keys outside the trace (wait, ...) are left out
+    return frame_from_columns({key: np.asarray(result[key], dtype=dtype) for key, dtype in trace_dtypes.items()},
+                              trace_names, trace_labels)
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Summary-only mode: chunks are folded into running statistics and dropped, so memory does not grow with n_cars
+
+class StreamingSummary:
+    # Running counterparts of the SimulationState metrics
+    def __init__(self, histogram_bin_width=1, histogram_bins=4096, servers=default_servers):
+        self.servers = tuple(servers)
+        self.cars = 0
+        self.total_time = 0
+        self.wait_stats = {pump: RunningStats() for pump in pumps}
+        self.queue_stats = {pump: RunningStats() for pump in pumps}
+        self.service_stats = {cat: RunningStats() for cat in categories}
+        self.wait_bins = {pump: FixedHistogram(histogram_bin_width, histogram_bins) for pump in pumps}
+        self.idle_times = {pump: 0 for pump in pumps}
+        self.waiting_cars = {pump: 0 for pump in pumps}
+        self.service_totals = {pump: 0 for pump in pumps}
+        self.service_squares = {pump: 0 for pump in pumps}
+        self.inter_arrival_total = 0
+        self.wait_series = {name: BatchSeries() for name in [*pumps, "Overall"]}
+        self.resume = None  # (streams, queue_state) where the run stopped, set by simulate_summary
+
+    def update(self, chunk):
+        # Fold one chunk of simulate_chunks columns into the running statistics
+        self.cars += len(chunk["pump"])
+        self.inter_arrival_total += int(chunk["inter_arrival"].sum())
+        self.wait_series["Overall"].update_array(chunk["wait"])
+        if len(chunk["pump"]):
+            self.total_time = max(self.total_time, int(chunk["service_end"].max()))
+        for code, pump in enumerate(pumps):
+            on_pump = chunk["pump"] == code
+            wait = chunk["wait"][on_pump]
+            self.wait_stats[pump].update_array(wait)
+            self.wait_bins[pump].update_array(wait)
+            self.wait_series[pump].update_array(wait)
+            self.queue_stats[pump].update_array(chunk["queue_length"][on_pump])
+            self.idle_times[pump] += int(chunk["idle_time"][on_pump].sum())
+            self.waiting_cars[pump] += int(np.count_nonzero(wait))
+            service = chunk["service_time"][on_pump].astype(np.int64)
+            self.service_totals[pump] += int(service.sum())
+            self.service_squares[pump] += int((service * service).sum())
+        for code, cat in enumerate(categories):
+            self.service_stats[cat].update_array(chunk["service_time"][chunk["category"] == code])
+
+    def figures(self):
+        # Same aggregates as SimulationState.figures
+        total_wait = sum(stats.mean * stats.count for stats in self.wait_stats.values())
+        return {
+            "cars": self.cars,
+            "pump_cars": {pump: stats.count for pump, stats in self.wait_stats.items()},
+            "avg_service_times": {cat: stats.mean for cat, stats in self.service_stats.items()},
+            "avg_wait_times": {pump: stats.mean for pump, stats in self.wait_stats.items()},
+            "overall_avg_wait": total_wait / self.cars,
+            "max_queue_lengths": {pump: int(stats.max) if stats.count else 0 for pump, stats in self.queue_stats.items()},
+            "prob_car_waits": {pump: self.waiting_cars[pump] / self.cars for pump in pumps},
+            "idle_portions": {pump: self.idle_times[pump] / (c * self.total_time) for pump, c in zip(pumps, self.servers)},
+            "pump_service_moments": service_moments(self.service_totals, self.service_squares,
+                                                    {pump: stats.count for pump, stats in self.wait_stats.items()}),
+        }
+
+    def wait_histograms(self, bins=10):
+        return {pump: hist.histogram(bins) for pump, hist in self.wait_bins.items() if hist.stats.count}
+
+    def steady_state(self, n_batches=20):
+        # Same as SimulationState.steady_state, from the running batch means
+        return {name: steady_state_interval(waits, n_batches) for name, waits in self.wait_series.items()}
+
+    def summary(self):
+        # Per-pump summary_metrics and the run's mean inter-arrival and service time, as run_replications uses them
+        figures = self.figures()
+        total_service = sum(stats.mean * stats.count for stats in self.service_stats.values())
+        return {
+            "Average Wait": figures["avg_wait_times"],
+            "Max Queue": figures["max_queue_lengths"],
+            "P(Wait)": figures["prob_car_waits"],
+            "Idle Fraction": figures["idle_portions"],
+            "Controls": (self.inter_arrival_total / self.cars, total_service / self.cars),
+        }
+
+class SampledTrace:
+    # Trace sink keeping every `every`-th car, up to max_rows rows
+    def __init__(self, every=1000, max_rows=100000):
+        self.every = every
+        self.max_rows = max_rows
+        self.trace = TraceStore(trace_dtypes)
+
+    @property
+    def rows(self):
+        return len(self.trace)
+
+    def __call__(self, chunk):
+        if self.rows >= self.max_rows:
+            return
+        keep = (chunk["car_number"] - 1) % self.every == 0
+        self.trace.extend({key: chunk[key][keep][:self.max_rows - self.rows] for key in trace_dtypes})
+
+    def to_table(self):
+        return batch_to_table(self.trace.columns())
+
+def simulate_summary(n_cars, seed=None, chunk_size=2**16, trace_sink=None, progress=None, cancel=None,
+                     servers=default_servers, antithetic=False, relative_precision=None, summary=None):
+    # Summary-only run; trace_sink, if given, is called with every chunk of columns (e.g. SampledTrace or a writer).
+    # progress/cancel and the relative_precision stopping rule are handled between chunks as in simulate.
+    # A summary from an earlier run is continued up to n_cars cars in total (seed, servers, antithetic are ignored)
+    if summary is None:
+        summary = StreamingSummary(servers=servers)
+        summary.resume = (make_streams(seed, antithetic), QueueState(servers))
+    check_progress(summary.cars, n_cars, progress, cancel)
+    if relative_precision is not None and precision_reached(summary.wait_series["Overall"], relative_precision):
+        return summary  # A continued run that had already stopped
+    for chunk in simulate_chunks(n_cars, chunk_size=chunk_size, resume=summary.resume):
+        summary.update(chunk)
+        if trace_sink is not None:
+            trace_sink(chunk)
+        check_progress(summary.cars, n_cars, progress, cancel)
+        if relative_precision is not None and precision_reached(summary.wait_series["Overall"], relative_precision):
+            break
+    return summary
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Cached runs (see run_cache.RunCache): a seeded run is keyed by its model parameters, seed and number of cars,
+# and a longer run continues the streams and queues of the longest shorter one instead of starting over.
+# Summaries are small and go to the disk store too; full tables stay in memory.
+
+table_bytes_per_car = 40  # Memory of one car in a SimulationState (trace columns and metric arrays), from tracemalloc
+
+def model_parameters(servers=default_servers, relative_precision=None):
+    # Everything besides the seed and the number of cars that decides a run, as a hashable cache key
+    return (tuple(servers), relative_precision, tuple(arrival_probabilities), tuple(category_probs),
+            tuple(a_and_b_service_probs), tuple(c_service_probs), tuple(arrival_values),
+            tuple(a_and_b_service_values), tuple(c_service_values), b_balk_limit, c_balk_limit)
+
+def valid_cached_summary(value):
+    # A (summary, SampledTrace) pair loaded from the disk store must be laid out like the current classes
+    return (isinstance(value, tuple) and len(value) == 2 and same_layout(value[0], StreamingSummary())
+            and same_layout(value[1], SampledTrace()) and same_layout(value[1].trace, TraceStore(trace_dtypes)))
+
+def simulate_cached(cache, n_cars, seed=None, servers=default_servers, summary_only=False, relative_precision=None,
+                    progress=None, cancel=None, trace_every=1000, trace_rows=1000):
+    # (state, trace): a simulate() state and None, or with summary_only a simulate_summary() summary and its
+    # SampledTrace. Without a cache or a seed every call is a fresh run
+    if summary_only:
+        model, params = "gas-summary", (model_parameters(servers, relative_precision), trace_every, trace_rows)
+    else:
+        model, params = "gas-table", model_parameters(servers, relative_precision)
+    valid = valid_cached_summary if summary_only else None  # Full tables are only kept in memory
+    cached = cache.get(model, params, seed, n_cars, valid) if cache is not None else None
+    if cached is not None:
+        return cached
+    previous = cache.take_prefix(model, params, seed, n_cars, valid) if cache is not None else None
+    if summary_only:
+        summary, trace = previous[1] if previous else (None, SampledTrace(trace_every, trace_rows))
+        summary = simulate_summary(n_cars, seed=seed, trace_sink=trace, progress=progress, cancel=cancel,
+                                   servers=servers, relative_precision=relative_precision, summary=summary)
+        result = (summary, trace)
+        if cache is not None:
+            cache.put(model, params, seed, n_cars, result, persist=True)
+    else:
+        state = simulate(n_cars, seed=seed, state=previous[1][0] if previous else None, progress=progress,
+                         cancel=cancel, servers=servers, relative_precision=relative_precision)
+        result = (state, None)
+        if cache is not None:
+            cache.put(model, params, seed, n_cars, result, size=len(state.trace) * table_bytes_per_car)
+    return result
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Replications: independent runs on a process pool, each returning only its summary metrics.
+# Every summary also carries its mean inter-arrival and service time ("Controls"), whose expectations are known,
+# so the average waits can be estimated with control variates; with antithetic=True each replication is a pair
+# of runs on mirrored random numbers. Both shrink the CI for the same number of cars simulated.
+
+summary_metrics = ["Average Wait", "Max Queue", "P(Wait)", "Idle Fraction"]
+
+def _replication_summary(n_cars, seed, servers=default_servers, antithetic=False, cancel=None):
+    # Worker: only the small summary dict travels back to the parent process
+    return simulate_summary(n_cars, seed=seed, servers=servers, antithetic=antithetic, cancel=cancel).summary()
+
+def run_replications(n_cars, replications, seed=None, max_workers=None, progress=None, cancel=None,
+                     servers=default_servers, antithetic=False, cache=None):
+    # Run independent replications in parallel, one SeedSequence child stream each (two runs each when antithetic);
+    # progress(done, total) counts finished runs, cancel stops the running ones and drops the rest.
+    # With a run_cache.RunCache and a seed, the aggregate is reused when the same replications are asked again
+    params = (model_parameters(servers), replications, antithetic)
+    cached = cache.get("gas-replications", params, seed, n_cars, valid_cached_aggregate) if cache is not None else None
+    if cached is not None:
+        return cached
+    children = np.random.SeedSequence(seed).spawn(replications)
+    mirrors = (False, True) if antithetic else (False,)
+    tasks = [((index, mirrored), (n_cars, child, servers, mirrored))
+             for index, child in enumerate(children) for mirrored in mirrors]
+    runs = dict(pool_results(_replication_summary, tasks, progress, cancel, max_workers))
+    summaries = [average_summaries([runs[index, mirrored] for mirrored in mirrors]) for index in range(replications)]
+    aggregate = aggregate_summaries(summaries)
+    aggregate["Reduced Wait"] = reduced_wait_estimates(summaries, list(runs.values()), antithetic)
+    if cache is not None:
+        cache.put("gas-replications", params, seed, n_cars, aggregate, persist=True)
+    return aggregate
+
+def valid_cached_aggregate(value):
+    # A run_replications result loaded from the disk store
+    return isinstance(value, dict) and value.keys() == {*summary_metrics, "Reduced Wait"}
+
+def average_summaries(summaries):
+    # Element-wise mean of run summaries (an antithetic pair becomes one replication)
+    if len(summaries) == 1:
+        return summaries[0]
+    averaged = {metric: {pump: float(np.mean([summary[metric][pump] for summary in summaries])) for pump in pumps}
+                for metric in summary_metrics}
+    averaged["Controls"] = tuple(np.mean([summary["Controls"] for summary in summaries], axis=0).tolist())
+    return averaged
+
+def aggregate_summaries(summaries):
+    # Mean and 95% confidence half-width of every metric across replications
+    return {
+        metric: {pump: confidence_interval([summary[metric][pump] for summary in summaries]) for pump in pumps}
+        for metric in summary_metrics
+    }
+
+def reduced_wait_estimates(summaries, runs, antithetic=False):
+    # Variance-reduced estimate of each pump's average wait over the replications: the mean of the antithetic pairs,
+    # or the control-variate estimate for independent runs (the controls are what the pairs already balance, so
+    # they add nothing there). plain_runs is how many plain independent runs would give the same CI width,
+    # with their variance estimated from the individual runs. With too few replications to fit the controls the
+    # estimate is the plain interval, reported as such with no runs saved
+    controls = [summary["Controls"] for summary in summaries]
+    degrees_of_freedom = len(summaries) - 1 if antithetic else len(summaries) - len(controls[0]) - 1
+    if antithetic:
+        method = "antithetic pairs"
+    elif degrees_of_freedom >= 1:
+        method = "control variates"
+    else:  # control_variate_interval falls back to the plain interval
+        method = "plain replications"
+        degrees_of_freedom = len(summaries) - 1
+    estimates = {}
+    for pump in pumps:
+        waits = [summary["Average Wait"][pump] for summary in summaries]
+        if method == "control variates":
+            mean, half_width = control_variate_interval(waits, controls, (inter_arrival_mean, service_mean))
+        else:
+            mean, half_width = confidence_interval(waits)
+        plain_runs = len(runs)
+        if method != "plain replications" and half_width > 0:
+            plain_variance = float(np.var([run["Average Wait"][pump] for run in runs], ddof=1)) if len(runs) > 1 else 0.0
+            standard_error = half_width / t_critical(degrees_of_freedom)
+            # Rounded first so that a ratio of n plus floating-point noise is not counted as one more run
+            plain_runs = math.ceil(round(plain_variance / standard_error ** 2, 6))
+        estimates[pump] = {
+            "estimate": (mean, half_width),
+            "method": method,
+            "runs": len(runs),
+            "plain_runs": plain_runs,
+        }
+    return estimates
+
+def format_replications(aggregate, replications, section=7):
+    # section: 7 after the extra-pump section 6 of get_statistics, 6 when it was left out
+    runs = next(iter(aggregate["Reduced Wait"].values()))["runs"] if "Reduced Wait" in aggregate else replications
+    kind = "runs" if runs == replications else "antithetic pairs"
+    text = f"\n{section}. Replications ({replications} {kind}, mean ± 95% CI):\n"
+    for metric in summary_metrics:
+        text += f"   {metric}:\n"
+        for pump, (mean, half_width) in aggregate[metric].items():
+            text += f"      {pump}: {mean:.3f} ± {half_width:.3f}\n"
+    if "Reduced Wait" in aggregate:
+        text += f"   Average Wait with {next(iter(aggregate['Reduced Wait'].values()))['method']}:\n"
+        for pump, reduced in aggregate["Reduced Wait"].items():
+            mean, half_width = reduced["estimate"]
+            saved = reduced["plain_runs"] - reduced["runs"]
+            text += (f"      {pump}: {mean:.3f} ± {half_width:.3f} ({reduced['runs']} runs, "
+                     f"{f'{saved} runs saved' if saved > 0 else 'no runs saved'} against plain replications)\n")
+    return text
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# What-if: one extra pump. The current configuration and each +1 candidate are re-simulated with the same seeds
+# (common random numbers: every car arrives, picks its category and service time identically in all of them),
+# so each replication gives a paired difference in mean wait with a much narrower CI than independent runs.
+# The GUI caps the cars per run at what_if_max_cars so the comparison stays interactive.
+
+what_if_max_cars = 20000
+
+def extra_pump_candidates(servers=default_servers):
+    # {pump: servers with one more at that pump}
+    return {pump: tuple(c + (index == code) for index, c in enumerate(servers)) for code, pump in enumerate(pumps)}
+
+def _mean_wait(n_cars, seed, servers, cancel=None):
+    # Worker: overall mean wait of one run
+    return simulate_summary(n_cars, seed=seed, servers=servers, cancel=cancel).figures()["overall_avg_wait"]
+
+def evaluate_extra_pump(n_cars, replications=10, seed=None, servers=default_servers, max_workers=None,
+                        progress=None, cancel=None, cache=None):
+    # Mean wait of the current configuration and reduction in it for each +1 candidate, as (mean, 95% CI half-width);
+    # all configuration x replication runs go to a process pool, progress(done, total) counts finished runs.
+    # With a run_cache.RunCache and a seed, the result is reused when the same what-if is asked again
+    params = (model_parameters(servers), replications)
+    cached = cache.get("gas-what-if", params, seed, n_cars, valid_cached_extra_pump) if cache is not None else None
+    if cached is not None:
+        return cached
+    children = np.random.SeedSequence(seed).spawn(replications)
+    configurations = {"current": tuple(servers), **extra_pump_candidates(servers)}
+    waits = {name: [None] * replications for name in configurations}
+    tasks = [((name, index), (n_cars, child, config))
+             for index, child in enumerate(children) for name, config in configurations.items()]
+    for (name, index), wait in pool_results(_mean_wait, tasks, progress, cancel, max_workers):
+        waits[name][index] = wait
+    current = waits["current"]
+    reductions = {pump: confidence_interval([a - b for a, b in zip(current, waits[pump])]) for pump in pumps}
+    result = {
+        "servers": tuple(servers),
+        "replications": replications,
+        "cars": n_cars,
+        "current": confidence_interval(current),
+        "reductions": reductions,
+        "best": max(reductions, key=lambda pump: reductions[pump][0]),
+    }
+    if cache is not None:
+        cache.put("gas-what-if", params, seed, n_cars, result, persist=True)
+    return result
+
+def valid_cached_extra_pump(value):
+    # An evaluate_extra_pump result loaded from the disk store
+    return isinstance(value, dict) and value.keys() == {"servers", "replications", "cars", "current", "reductions", "best"}
+
+def format_extra_pump(result):
+    mean, half_width = result["current"]
+    text = (f"\n6. Impact of Adding One Extra Pump ({result['replications']} paired runs of {result['cars']:,} cars, "
+            f"mean ± 95% CI):\n")
+    text += f"   Current pumps {'/'.join(map(str, result['servers']))}: avg wait time = {mean:.2f} ± {half_width:.2f} minutes\n"
+    for pump, (reduction, half_width) in result["reductions"].items():
+        text += f"   {pump}: Reduction in avg wait time = {reduction:.2f} ± {half_width:.2f} minutes\n"
+    text += f"   Best pump to add: {result['best']}\n"
+    return text
@@ -0,0 +1,416 @@
+import math
+import os
+from functools import partial
+
+import numpy as np
+
+from confidence import confidence_interval
+from progress import check_progress, pool_results
+from run_cache import same_layout
+from sampling import DiscreteSampler
+from trace_store import TraceStore
+
+# Room Occupied Ranges
+room_occupancy_ranges = {
+    (0, 10): 1,
+    (11, 25): 2,
+    (26, 60): 3,
+    (61, 80): 4,
+    (81, 100): 5
+}
+
+# Lead Time Ranges (from the provided table)
+lead_time_ranges = {
+    (1, 40): 1,
+    (41, 75): 2,
+    (76, 100): 3
+}
+
+# Lookup tables indexed by the random number 1-100
+room_sampler = DiscreteSampler.from_ranges(room_occupancy_ranges)
+lead_time_sampler = DiscreteSampler.from_ranges(lead_time_ranges)
+
+# Columns of the simulation table; "First Floor Inventory" is the stock at the start of the day, before consumption
+columns = [
+    "Cycle", "Day", "First Floor Inventory", "Random Room", "Rooms Occupied",
+    "Daily Consumption", "End Inventory", "Shortage", "Basement Inventory",
+    "Order Quantity", "Random Lead Time", "Lead Time (Days Until Order Arrives)"
+]
+
+# Smallest dtypes holding every column (stock and order sizes are bounded by M, days by max_days)
+column_dtypes = {
+    "Cycle": np.int32, "Day": np.int32, "First Floor Inventory": np.int32, "Random Room": np.int16,
+    "Rooms Occupied": np.int8, "Daily Consumption": np.int8, "End Inventory": np.int32, "Shortage": np.int32,
+    "Basement Inventory": np.int32, "Order Quantity": np.int32, "Random Lead Time": np.int16,
+    "Lead Time (Days Until Order Arrives)": np.int8,
+}
+
+# Linear-scan mappers of the original model, kept for reference and the sampler benchmark
+# Map random number to Lead Time
+def map_lead_time(random_number):
+    for (low, high), lead_time in lead_time_ranges.items():
+        if low <= random_number <= high:
+            return lead_time
+    return 1  # Default fallback (should never be reached)
+
+def map_rooms_occupied(random_number):
+    for (low, high), rooms in room_occupancy_ranges.items():
+        if low <= random_number <= high:
+            return rooms
+    return 1  # Default fallback (should never be reached)
+
+def map_ranges_array(random_numbers, ranges):
+    # Vectorized range lookup: value of the first range whose upper bound is >= each number
+    bounds = sorted(ranges.items())
+    uppers = np.array([high for (low, high), value in bounds])
+    values = np.array([value for (low, high), value in bounds])
+    return values[np.minimum(np.searchsorted(uppers, random_numbers, side="left"), len(values) - 1)]
+
+def make_streams(seed=None):
+    # Independent streams for the daily room draws and the lead-time draws (one per order placed),
+    # shared by the scalar and batch engines so the same seed gives the same table
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed_seq.spawn(2)]
+
+def draw_random_number(rng):
+    # Random number 1-100 from a uniform draw
+    return int(rng.random() * 100) + 1
+
+def draw_random_numbers(rng, n):
+    # Batched draw_random_number, same stream consumption as n scalar draws
+    return (rng.random(n) * 100).astype(np.int16) + 1
+
+# Simulation function
+def simulate_hospital_inventory(N, M, max_days=20, days_per_cycle=6, seed=None, first_floor_inventory=4):
+    # first_floor_inventory: stock on the first floor before day 1
+    room_rng, lead_rng = make_streams(seed)
+    trace = TraceStore(column_dtypes)
+    (append_cycle, append_day, append_first_floor, append_random_room, append_rooms, append_consumption,
+     append_end, append_shortage, append_basement, append_order, append_random_lead, append_lead) = trace.appenders()
+
+    # Start inventories
+    basement_inventory = M
+    lead_time_remaining = 0
+    order_quantity = 0
+    total_days = 0
+    cycle = 1
+
+    while total_days < max_days:
+        for day in range(1, days_per_cycle + 1):
+            total_days += 1
+            if total_days > max_days:
+                break
+
+            start_first_floor = first_floor_inventory  # Recorded for the day, as the table shows the start of it
+            random_room = draw_random_number(room_rng)
+            rooms_occupied = room_sampler.lookup(random_room)
+            daily_consumption = rooms_occupied
+
+            # Calculate End Inventory and Shortage
+            if first_floor_inventory >= daily_consumption:
+                end_inventory = first_floor_inventory - daily_consumption
+                shortage = 0
+            else:
+                shortage = daily_consumption - first_floor_inventory
+                end_inventory = -shortage
+
+            # Update First Floor Inventory for the next day
+            if end_inventory >= 0:
+                first_floor_inventory = end_inventory
+            else:
+                # Up to 10 units come up from the basement, the shortage is served first; an empty basement
+                # leaves the first floor empty, so shortages depend on the ordering policy
+                shortage = abs(end_inventory)
+                available_in_basement = basement_inventory
+                to_deduct = min(10, available_in_basement)
+                first_floor_inventory = to_deduct - shortage if shortage <= to_deduct else 0
+                basement_inventory -= to_deduct  # Reduce basement inventory dynamically
+
+            # Handle lead time for basement replenishment
+            if lead_time_remaining > 0:
+                lead_time_remaining -= 1
+                if lead_time_remaining == 0:
+                    basement_inventory = M
+
+            # Place order every N days
+            if total_days % N == 0 and lead_time_remaining == 0:
+                order_quantity = M - basement_inventory
+                random_lead_time = draw_random_number(lead_rng)  # Generate integer random number
+                lead_time_remaining = lead_time_sampler.lookup(random_lead_time)  # Map random number to lead time
+            else:
+                order_quantity = 0
+                random_lead_time = 0  # Set random lead time to 0 if no new order
+
+            # Append the day results, one typed column each
+            append_cycle(cycle)
+            append_day(total_days)
+            append_first_floor(start_first_floor)
+            append_random_room(random_room)
+            append_rooms(rooms_occupied)
+            append_consumption(daily_consumption)
+            append_end(end_inventory)
+            append_shortage(shortage)
+            append_basement(basement_inventory)
+            append_order(order_quantity)
+            append_random_lead(random_lead_time)
+            append_lead(lead_time_remaining if lead_time_remaining > 0 else 0)
+
+        # Increment cycle after each set of days
+        cycle += 1
+
+    return trace.to_frame()
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Batch engine: room and lead-time numbers are drawn up front and mapped through the sampler lookup tables,
+# the stateful inventory recurrence runs in one tight loop (compiled with Numba when it is installed).
+
+def _inventory_recurrence(consumption, lead_random, lead_times, N, M, first_day,
+                          first_floor_inventory, basement_inventory, lead_time_remaining,
+                          first_floor, end_inventory, shortage, basement, order_quantity, random_lead_time, lead_time):
+    # Same day-by-day rules as simulate_hospital_inventory, starting after day first_day - 1 with the given stock.
+    # Fills the output columns in place and returns the state for the next day plus the number of orders placed;
+    # the k-th order placed uses lead_random[k] / lead_times[k].
+    orders = 0
+    for i in range(len(consumption)):
+        first_floor[i] = first_floor_inventory  # Start of the day
+        daily_consumption = consumption[i]
+        if first_floor_inventory >= daily_consumption:
+            end = first_floor_inventory - daily_consumption
+            short = 0
+        else:
+            short = daily_consumption - first_floor_inventory
+            end = -short
+
+        if end >= 0:
+            first_floor_inventory = end
+        else:
+            to_deduct = min(10, basement_inventory)
+            first_floor_inventory = to_deduct - short if short <= to_deduct else 0
+            basement_inventory -= to_deduct
+
+        if lead_time_remaining > 0:
+            lead_time_remaining -= 1
+            if lead_time_remaining == 0:
+                basement_inventory = M
+
+        if (first_day + i) % N == 0 and lead_time_remaining == 0:
+            order_quantity[i] = M - basement_inventory
+            random_lead_time[i] = lead_random[orders]
+            lead_time_remaining = lead_times[orders]
+            orders += 1
+        else:
+            order_quantity[i] = 0
+            random_lead_time[i] = 0
+
+        end_inventory[i] = end
+        shortage[i] = short
+        basement[i] = basement_inventory
+        lead_time[i] = lead_time_remaining
+    return first_floor_inventory, basement_inventory, lead_time_remaining, orders
+
+_compiled_recurrence = None
+
+def compiled_inventory_recurrence():
+    # _inventory_recurrence compiled with Numba (loaded from its cache after the first run), or None without Numba.
+    # Imported on first use so that importing this module stays cheap.
+    global _compiled_recurrence
+    if _compiled_recurrence is None:
+        try:
+            from numba import njit
+        except ImportError:  # Numba is optional, the batch engine falls back to a plain Python loop
+            _compiled_recurrence = False
+        else:
+            _compiled_recurrence = njit(cache=True)(_inventory_recurrence)
+    return _compiled_recurrence or None
+
+class InventoryState:
+    # Inventory state carried from one chunk of days to the next
+    def __init__(self, M, first_floor_inventory=4):
+        self.days = 0
+        self.first_floor_inventory = first_floor_inventory  # 4 on the first floor unless given
+        self.basement_inventory = M
+        self.lead_time_remaining = 0
+        self.lead_random = np.empty(0, dtype=np.int16)  # Lead-time numbers drawn but not yet used by an order
+
+def simulate_hospital_chunks(N, M, max_days=20, days_per_cycle=6, seed=None, chunk_size=2**16, use_numba=True,
+                             first_floor_inventory=4, resume=None):
+    # Yield simulate_hospital_batch columns chunk by chunk; each chunk continues the streams and stock of the last,
+    # so the concatenated chunks equal one simulate_hospital_batch call for the same seed.
+    # resume: (streams, inventory_state) of an earlier run, continued up to max_days days in total
+    streams, inventory_state = resume or (make_streams(seed), InventoryState(M, first_floor_inventory))
+    while inventory_state.days < max_days:
+        yield _simulate_hospital_chunk(streams, N, M, min(chunk_size, max_days - inventory_state.days),
+                                       days_per_cycle, inventory_state, use_numba)
+
+def simulate_hospital_batch(N, M, max_days=20, days_per_cycle=6, seed=None, use_numba=True, first_floor_inventory=4):
+    # Dict of NumPy columns (keyed like the simulate_hospital_inventory table) for the same seed
+    return _simulate_hospital_chunk(make_streams(seed), N, M, max_days, days_per_cycle,
+                                    InventoryState(M, first_floor_inventory), use_numba)
+
+def _simulate_hospital_chunk(streams, N, M, n_days, days_per_cycle, inventory_state, use_numba):
+    room_rng, lead_rng = streams
+    random_room = draw_random_numbers(room_rng, n_days)
+    rooms_occupied = room_sampler.lookup_array(random_room).astype(np.int8)
+    # Orders are only placed on days divisible by N, so n_days // N + 1 numbers always suffice;
+    # top up the ones left unused by the last chunk (the stream is read in order, so chunking does not change them)
+    needed = n_days // N + 1 - len(inventory_state.lead_random)
+    lead_random = np.concatenate([inventory_state.lead_random, draw_random_numbers(lead_rng, max(needed, 0))])
+    lead_times = lead_time_sampler.lookup_array(lead_random).astype(np.int8)
+
+    first_day = inventory_state.days + 1
+    day = np.arange(first_day, first_day + n_days, dtype=np.int32)
+    result = {
+        "Cycle": (day - 1) // days_per_cycle + 1,
+        "Day": day,
+        "Random Room": random_room,
+        "Rooms Occupied": rooms_occupied,
+        "Daily Consumption": rooms_occupied,
+    }
+    outputs = {name: column_dtypes[name] for name in [
+        "First Floor Inventory", "End Inventory", "Shortage", "Basement Inventory", "Order Quantity",
+        "Random Lead Time", "Lead Time (Days Until Order Arrives)"]}
+    start = (first_day, inventory_state.first_floor_inventory, inventory_state.basement_inventory,
+             inventory_state.lead_time_remaining)
+    compiled = compiled_inventory_recurrence() if use_numba else None
+    if compiled is not None:
+        # Compiled loop writes straight into preallocated NumPy columns
+        arrays = {name: np.empty(n_days, dtype=dtype) for name, dtype in outputs.items()}
+        end_state = compiled(rooms_occupied, lead_random, lead_times, N, M, *start, *arrays.values())
+    else:
+        # Plain Python is much faster indexing lists than NumPy scalars; the lists become columns at the end
+        lists = {name: [0] * n_days for name in outputs}
+        end_state = _inventory_recurrence(rooms_occupied.tolist(), lead_random.tolist(), lead_times.tolist(),
+                                          N, M, *start, *lists.values())
+        arrays = {name: np.array(values, dtype=outputs[name]) for name, values in lists.items()}
+    result.update(arrays)
+
+    first_floor_inventory, basement_inventory, lead_time_remaining, orders = end_state
+    inventory_state.days += n_days
+    inventory_state.first_floor_inventory = int(first_floor_inventory)
+    inventory_state.basement_inventory = int(basement_inventory)
+    inventory_state.lead_time_remaining = int(lead_time_remaining)
+    inventory_state.lead_random = lead_random[orders:]
+    return {name: result[name] for name in columns}
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Policy grid search over review period N and basement capacity M.
+# Replication r uses the same seed in every (N, M) cell (common random numbers), so differences between
+# cells come from the policy rather than from different demand draws.
+
+policy_metrics = ["Shortage Days", "Avg First Floor", "Avg Basement", "Cost per Day"]
+
+class InventorySummary:
+    # Running totals behind the policy metrics, so chunked runs can be summarized without keeping the days
+    def __init__(self):
+        self.days = 0
+        self.first_floor_total = 0
+        self.basement_total = 0
+        self.shortage_days = 0
+        self.units_short = 0
+        self.orders = 0
+        self.resume = None  # (streams, inventory_state) where the run stopped, set by simulate_hospital_summary
+
+    def update(self, chunk):
+        # Fold one chunk of simulate_hospital_chunks columns into the totals
+        self.days += len(chunk["Day"])
+        self.first_floor_total += int(chunk["First Floor Inventory"].sum())
+        self.basement_total += int(chunk["Basement Inventory"].sum())
+        self.shortage_days += int(np.count_nonzero(chunk["Shortage"]))
+        self.units_short += int(chunk["Shortage"].sum())
+        self.orders += int(np.count_nonzero(chunk["Random Lead Time"]))
+
+    def metrics(self, holding_cost=1.0, shortage_cost=20.0, order_cost=10.0):
+        # Cost per day = holding on both floors + units short + orders placed
+        avg_first_floor = self.first_floor_total / self.days
+        avg_basement = self.basement_total / self.days
+        return {
+            "Shortage Days": self.shortage_days,
+            "Avg First Floor": avg_first_floor,
+            "Avg Basement": avg_basement,
+            "Cost per Day": holding_cost * (avg_first_floor + avg_basement)
+                            + (shortage_cost * self.units_short + order_cost * self.orders) / self.days,
+        }
+
+def simulate_hospital_summary(N, M, max_days=20, days_per_cycle=6, seed=None, chunk_size=2**16, summary=None,
+                              first_floor_inventory=4, cancel=None):
+    # InventorySummary of a chunked run; a summary from an earlier run is continued up to max_days days in total
+    # (its seed and first_floor_inventory are kept). cancel is checked between chunks
+    if summary is None:
+        summary = InventorySummary()
+        summary.resume = (make_streams(seed), InventoryState(M, first_floor_inventory))
+    for chunk in simulate_hospital_chunks(N, M, max_days, days_per_cycle, chunk_size=chunk_size, resume=summary.resume):
+        check_progress(summary.days, max_days, cancel=cancel)
+        summary.update(chunk)
+    return summary
+
+def _evaluate_policy(N, M, max_days, days_per_cycle, seeds, summaries=None, first_floor_inventory=4, cancel=None):
+    # Worker: one chunk of the replications of an (N, M) cell as InventorySummaries, continuing the given ones if any
+    summaries = summaries or [None] * len(seeds)
+    return [simulate_hospital_summary(N, M, max_days, days_per_cycle, seed=seed, summary=summary,
+                                      first_floor_inventory=first_floor_inventory, cancel=cancel)
+            for seed, summary in zip(seeds, summaries)]
+
+def model_parameters(N, M, days_per_cycle=6, replications=30, first_floor_inventory=4):
+    # Everything besides the seed and the number of days that decides a policy cell, as a hashable cache key
+    return (N, M, days_per_cycle, replications, first_floor_inventory, tuple(sorted(room_occupancy_ranges.items())),
+            tuple(sorted(lead_time_ranges.items())))
+
+def valid_cached_policy(value, replications):
+    # The InventorySummary list of one cell, as loaded from the disk store
+    return (isinstance(value, list) and len(value) == replications
+            and all(same_layout(summary, InventorySummary()) for summary in value))
+
+def policy_grid_search(N_values, M_values, replications=30, max_days=365, days_per_cycle=6, seed=None,
+                       holding_cost=1.0, shortage_cost=20.0, order_cost=10.0, max_workers=None,
+                       progress=None, cancel=None, cache=None, first_floor_inventory=4):
+    # DataFrame with one row per (N, M): mean and 95% CI half-width ("<metric> ±") of every policy metric.
+    # Every run starts with first_floor_inventory on the first floor.
+    # With a run_cache.RunCache and a seed, cells run before are reused (the costs are applied afterwards, so they
+    # are not part of the key) and longer horizons continue the cached replications.
+    # Replications are split into chunks across the pool, so even a single cell uses every worker;
+    # progress(done, total) counts runs
+    import pandas as pd
+    seeds = np.random.SeedSequence(seed).spawn(replications)
+    costs = {"holding_cost": holding_cost, "shortage_cost": shortage_cost, "order_cost": order_cost}
+    cells = [(N, M) for N in N_values for M in M_values]
+    cell_runs = {}
+    pending = {}
+    valid = partial(valid_cached_policy, replications=replications)
+    cell_parameters = partial(model_parameters, days_per_cycle=days_per_cycle, replications=replications,
+                              first_floor_inventory=first_floor_inventory)
+    for N, M in cells:
+        params = cell_parameters(N, M)
+        cached = cache.get("hospital-policy", params, seed, max_days, valid) if cache is not None else None
+        if cached is not None:
+            cell_runs[N, M] = cached
+            continue
+        previous = cache.take_prefix("hospital-policy", params, seed, max_days, valid) if cache is not None else None
+        pending[N, M] = previous[1] if previous else None
+    total_runs = len(cells) * replications
+    done = len(cell_runs) * replications
+    check_progress(done, total_runs, progress, cancel)
+
+    # About four tasks per worker: whole cells for a large grid, single replications for a small one
+    workers = max_workers or os.cpu_count() or 1
+    chunk = min(replications, max(1, math.ceil(len(pending) * replications / (4 * workers))))
+    tasks = [((N, M, start), (N, M, max_days, days_per_cycle, seeds[start:start + chunk],
+                              summaries[start:start + chunk] if summaries else None, first_floor_inventory))
+             for (N, M), summaries in pending.items() for start in range(0, replications, chunk)]
+    partial_runs = {cell: [None] * replications for cell in pending}
+    for (N, M, start), runs in pool_results(_evaluate_policy, tasks, cancel=cancel, max_workers=max_workers):
+        partial_runs[N, M][start:start + len(runs)] = runs
+        done += len(runs)
+        if all(summary is not None for summary in partial_runs[N, M]):
+            cell_runs[N, M] = partial_runs.pop((N, M))
+            if cache is not None:
+                cache.put("hospital-policy", cell_parameters(N, M), seed, max_days, cell_runs[N, M], persist=True)
+        check_progress(done, total_runs, progress)
+
+    rows = []
+    for N, M in cells:
+        runs = [summary.metrics(**costs) for summary in cell_runs[N, M]]
+        row = {"N": N, "M": M}
+        for metric in policy_metrics:
+            row[metric], row[f"{metric} ±"] = confidence_interval([run[metric] for run in runs])
+        rows.append(row)
+    return pd.DataFrame(rows)
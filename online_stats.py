@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+
+class RunningStats:
+    # Welford running count/mean/variance plus min and max, in constant memory
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        # Add one observation (Welford)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update_array(self, values):
+        # Add a chunk of observations by merging its mean and M2 (Chan et al.)
+        if len(values) == 0:
+            return
+        values = np.asarray(values, dtype=float)
+        chunk_count = len(values)
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        self.mean += delta * chunk_count / total
+        self.m2 += chunk_m2 + delta * delta * self.count * chunk_count / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def variance(self):
+        # Sample variance (0 with fewer than two observations)
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+class FixedHistogram:
+    # Counts in fixed-width bins starting at 0; values past the last bin go to an overflow counter
+    def __init__(self, bin_width=1.0, n_bins=4096):
+        self.bin_width = bin_width
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.overflow = 0
+        self.stats = RunningStats()
+
+    def update_array(self, values):
+        if len(values) == 0:
+            return
+        values = np.asarray(values)
+        index = (values // self.bin_width).astype(np.int64)
+        binned = np.bincount(np.minimum(index, len(self.counts)), minlength=len(self.counts) + 1)
+        self.counts += binned[:-1]
+        self.overflow += int(binned[-1])
+        self.stats.update_array(values)
+
+    def histogram(self, bins=10):
+        # Re-bin into `bins` equal bins over the observed range, like np.histogram on the raw values.
+        # Exact for values that sit on bin edges (integer waits with bin_width 1); overflow counts land in the last bin.
+        left_edges = np.arange(len(self.counts)) * self.bin_width
+        weights = self.counts.astype(float)
+        weights[-1] += self.overflow
+        if self.stats.min < self.stats.max:
+            value_range = (self.stats.min, self.stats.max)
+        else:
+            value_range = (self.stats.min - 0.5, self.stats.max + 0.5)
+        return np.histogram(left_edges, bins=bins, range=value_range, weights=weights)
@@ -0,0 +1,104 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Optional per-phase instrumentation for the GUIs: wall time and peak traced memory (tracemalloc) of each phase of
+# a run, and with profile_path a cProfile of the same phases dumped as a pstats file (python -m pstats <file>).
+# Phases may run on a worker thread or the Tk thread, one at a time; memory in the process pools of the
+# replications and what-if runs is not traced.
+
+class PhaseProfiler:
+    def __init__(self, enabled=True, memory=True, profile_path=None):
+        self.enabled = enabled
+        self.memory = memory
+        self.profile_path = profile_path
+        self.records = []
+        self._profile = None
+        if enabled and profile_path:
+            import cProfile
+            self._profile = cProfile.Profile()
+
+    @contextmanager
+    def phase(self, name):
+        # Times the block; a no-op when disabled, so the GUIs can always wrap their phases
+        if not self.enabled:
+            yield
+            return
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        if self._profile is not None:
+            self._profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self._profile is not None:
+                self._profile.disable()
+            record = {"phase": name, "seconds": seconds}
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record["peak_mb"] = (peak - start_memory) / 2**20  # Above what was allocated when the phase began
+                record["retained_mb"] = (current - start_memory) / 2**20
+            self.records.append(record)
+
+    def finish(self):
+        # End of a run: stop tracing (it slows every allocation) and write the cProfile stats so far
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._profile is not None:
+            self._profile.dump_stats(self.profile_path)
+
+    def report(self):
+        if not self.records:
+            return "No phases recorded."
+        total = sum(record["seconds"] for record in self.records)
+        lines = [f"{'Phase':<28} {'Seconds':>9} {'Share':>7}" + (f" {'Peak MB':>9} {'Kept MB':>9}" if self.memory else "")]
+        for record in self.records:
+            line = f"{record['phase']:<28} {record['seconds']:9.3f} {record['seconds'] / total if total else 0:7.1%}"
+            if self.memory:
+                line += f" {record['peak_mb']:9.1f} {record['retained_mb']:9.1f}"
+            lines.append(line)
+        lines.append(f"{'Total':<28} {total:9.3f}")
+        if self._profile is not None:
+            lines.append(f"\ncProfile stats: {self.profile_path}")
+        return "\n".join(lines)
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"phases": self.records, "total_seconds": sum(record["seconds"] for record in self.records),
+                       "profile": self.profile_path if self._profile is not None else None}, file, indent=2)
+
+def profile_argument(argv=None):
+    # --profile [PATH] on a GUI command line: path for the pstats dump, None without the switch
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", nargs="?", const="profile.pstats", default=None,
+                        help="profile every run and dump cProfile stats to PATH (default profile.pstats)")
+    return parser.parse_args(argv).profile
+
+class PerformancePanel:
+    # Notebook tab content: the phase table of the last run and a button to export it as JSON
+    def __init__(self, master):
+        import tkinter as tk
+        from tkinter import ttk
+        self.profiler = None
+        self.text = tk.StringVar(value="No run profiled yet.")
+        ttk.Label(master, textvariable=self.text, justify="left", font="TkFixedFont").pack(anchor="w", padx=10, pady=5)
+        self.export_button = ttk.Button(master, text="Export JSON...", command=self.export, state="disabled")
+        self.export_button.pack(anchor="w", padx=10, pady=5)
+
+    def show(self, profiler):
+        self.profiler = profiler
+        self.text.set(profiler.report())
+        self.export_button.config(state="normal")
+
+    def export(self):
+        from tkinter.filedialog import asksaveasfilename
+        path = asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path:
+            self.profiler.to_json(path)
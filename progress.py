@@ -0,0 +1,47 @@
+class SimulationCancelled(Exception):
+    # Raised by the engines when their cancel event is set
+    pass
+
+def check_progress(done, total, progress=None, cancel=None):
+    # Report progress(done, total) and stop the run if cancel (a threading.Event) is set
+    if cancel is not None and cancel.is_set():
+        raise SimulationCancelled(f"cancelled after {done} of {total}")
+    if progress is not None:
+        progress(done, total)
+
+def pool_results(function, tasks, progress=None, cancel=None, max_workers=None, poll_seconds=0.1):
+    # Run function(*args, cancel=...) for every (key, args) of tasks on a process pool and yield (key, result) as
+    # they finish; progress(done, total) counts finished tasks. cancel is checked every poll_seconds and passed on to
+    # the workers as a multiprocessing Manager event, so running tasks stop at their next check_progress instead of
+    # being waited for. Workers are spawned rather than forked: the caller is often a GUI worker thread, and forking
+    # a multi-threaded process can deadlock
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    if not tasks:
+        return
+    context = multiprocessing.get_context("spawn")
+    manager = worker_cancel = None
+    if cancel is not None:
+        manager = context.Manager()
+        worker_cancel = manager.Event()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = {pool.submit(function, *args, cancel=worker_cancel): key for key, args in tasks}
+            pending = set(futures)
+            done = 0
+            try:
+                while pending:
+                    finished, pending = wait(pending, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        result = future.result()
+                        done += 1
+                        yield futures[future], result
+                    check_progress(done, len(futures), progress if finished else None, cancel)
+            except SimulationCancelled:
+                if worker_cancel is not None:
+                    worker_cancel.set()
+                pool.shutdown(cancel_futures=True)
+                raise
+    finally:
+        if manager is not None:
+            manager.shutdown()
@@ -1,204 +1,280 @@
-import numpy as np
-import pandas as pd
 import tkinter as tk
 from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-# Room Occupied Ranges
-room_occupancy_ranges = {
-    (0, 10): 1,
-    (11, 25): 2,
-    (26, 60): 3,
-    (61, 80): 4,
-    (81, 100): 5
-}
-
-# Lead Time Ranges (from the provided table)
-lead_time_ranges = {
-    (1, 40): 1,
-    (41, 75): 2,
-    (76, 100): 3
-}
-
-# Map random number to Lead Time
-def map_lead_time(random_number):
-    for (low, high), lead_time in lead_time_ranges.items():
-        if low <= random_number <= high:
-            return lead_time
-    return 1  # Default fallback (should never be reached)
-
-def map_rooms_occupied(random_number):
-    for (low, high), rooms in room_occupancy_ranges.items():
-        if low <= random_number <= high:
-            return rooms
-    return 1  # Default fallback (should never be reached)
-
-# Simulation function
-def simulate_hospital_inventory(N, M, max_days=20, days_per_cycle=6):
-    columns = [
-        "Cycle", "Day", "First Floor Inventory", "Random Room", "Rooms Occupied",
-        "Daily Consumption", "End Inventory", "Shortage", "Basement Inventory",
-        "Order Quantity", "Random Lead Time", "Lead Time (Days Until Order Arrives)"
-    ]
-    data = []
-
-    # Start inventories
-    first_floor_inventory = 4  # Start with 4 on the first floor
-    basement_inventory = M
-    lead_time_remaining = 0
-    order_quantity = 0
-    total_days = 0
-    cycle = 1
-
-    while total_days < max_days:
-        for day in range(1, days_per_cycle + 1):
-            total_days += 1
-            if total_days > max_days:
-                break
-
-            random_room = np.random.randint(1, 101)
-            rooms_occupied = map_rooms_occupied(random_room)
-            daily_consumption = rooms_occupied
-
-            # Calculate End Inventory and Shortage
-            if first_floor_inventory >= daily_consumption:
-                end_inventory = first_floor_inventory - daily_consumption
-                shortage = 0
-            else:
-                shortage = daily_consumption - first_floor_inventory
-                end_inventory = -shortage
-
-            # Update First Floor Inventory for the next day
-            if end_inventory >= 0:
-                first_floor_inventory = end_inventory
-            else:
-                shortage = abs(end_inventory)
-                first_floor_inventory = 10 - shortage if shortage <= 10 else 0
-                available_in_basement = basement_inventory
-                to_deduct = min(10, available_in_basement)
-                basement_inventory -= to_deduct  # Reduce basement inventory dynamically
-
-            # Handle lead time for basement replenishment
-            if lead_time_remaining > 0:
-                lead_time_remaining -= 1
-                if lead_time_remaining == 0:
-                    basement_inventory = M
-
-            # Place order every N days
-            if total_days % N == 0 and lead_time_remaining == 0:
-                order_quantity = M - basement_inventory
-                random_lead_time = int(np.random.randint(1, 101))  # Generate integer random number
-                lead_time_remaining = map_lead_time(random_lead_time)  # Map random number to lead time
-            else:
-                order_quantity = 0
-                random_lead_time = 0  # Set random lead time to 0 if no new order
-
-            # Append the day results
-            data.append([ 
-                cycle, total_days, first_floor_inventory, random_room, rooms_occupied,
-                daily_consumption, end_inventory, shortage, basement_inventory,
-                order_quantity, random_lead_time, lead_time_remaining if lead_time_remaining > 0 else 0
-            ])
-
-        # Increment cycle after each set of days
-        cycle += 1
-
-    return pd.DataFrame(data, columns=columns)
-
-# Generate the simulation table using the simulate_hospital_inventory function
-N = 6  # Example review period
-M = 30  # Example basement capacity
-simulation_table = simulate_hospital_inventory(N=N, M=M, max_days=20, days_per_cycle=6)
-
-# Assign manual custom values
-custom_first_floor_values = [4, 1, 7, 3, 0, 9, 6, 1, 8, 4, 1, 8, 6, 3, 9, 6, 3, 5, 9, 0]
-
-# Update manually for day 1
-simulation_table.loc[0, "First Floor Inventory"] = custom_first_floor_values[0]
-
-# Update for subsequent days
-for i in range(1, len(simulation_table)):
-    previous_end = simulation_table.loc[i - 1, "End Inventory"]
-    daily_consumption = simulation_table.loc[i, "Daily Consumption"]
-    if previous_end >= 0:
-        simulation_table.loc[i, "First Floor Inventory"] = previous_end
-    else:
-        shortage = abs(previous_end)
-        simulation_table.loc[i, "First Floor Inventory"] = 10 - shortage if shortage <= 10 else 0
-        available_in_basement = simulation_table.loc[i - 1, "Basement Inventory"]
-        to_deduct = min(10, available_in_basement)
-
-# Average Inventory Levels
-avg_first_floor_inventory = simulation_table["First Floor Inventory"].mean()
-avg_basement_inventory = simulation_table["Basement Inventory"].mean()
-
-# Number of Days with Shortages
-days_with_shortage = simulation_table[simulation_table["Shortage"] > 0].shape[0]
-
-# Theoretical and Experimental Demand
-theoretical_demand = sum([prob * rooms for prob, rooms in zip([0.1, 0.15, 0.35, 0.2, 0.2], [1, 2, 3, 4, 5])])
-experimental_demand = simulation_table["Daily Consumption"].mean()
-
-# Theoretical and Experimental Lead Time
-theoretical_lead_time = sum([prob * lead for prob, lead in zip([0.4, 0.35, 0.25], [1, 2, 3])])
-experimental_lead_time = simulation_table[simulation_table["Random Lead Time"] > 0]["Lead Time (Days Until Order Arrives)"].mean()
-
-# Tkinter GUI for displaying results
-root = tk.Tk()
-root.title("Hospital Inventory Simulation")
-
-# Tab Control
-tab_control = ttk.Notebook(root)
-
-# Tab 1 - Simulation Table
-tab1 = ttk.Frame(tab_control)
-tab_control.add(tab1, text="Simulation Table")
-
-# Display Simulation Table
-tree = ttk.Treeview(tab1, columns=list(simulation_table.columns), show="headings", height=10)
-for col in simulation_table.columns:
-    tree.heading(col, text=col)
-    tree.column(col, width=100)
-for index, row in simulation_table.iterrows():
-    tree.insert("", "end", values=list(row))
-tree.pack(padx=10, pady=10)
-
-# Tab 2 - Calculated Parameters
-tab2 = ttk.Frame(tab_control)
-tab_control.add(tab2, text="Calculated Parameters")
-
-# Display calculated parameters
-results_label = tk.Label(tab2, text=f"""
-Average First Floor Inventory: {avg_first_floor_inventory:.2f}
-Average Basement Inventory: {avg_basement_inventory:.2f}
-Days with Shortage: {days_with_shortage}
-Theoretical Demand: {theoretical_demand:.2f}
-Experimental Demand: {experimental_demand:.2f}
-Theoretical Lead Time: {theoretical_lead_time:.2f}
-Experimental Lead Time: {experimental_lead_time:.2f}
+from tkinter.messagebox import showinfo
+from virtual_table import VirtualTable
+from background_run import BackgroundRun
+from profiling import PerformancePanel, PhaseProfiler, profile_argument
+from run_cache import RunCache, default_directory
+from hospital import simulate_hospital_inventory, policy_grid_search, policy_metrics
+
+def run_hospital_simulation(N=6, M=30, max_days=20, days_per_cycle=6, first_floor_inventory=4, profiler=None):
+    # Simulation table and calculated parameters for one review period N and basement capacity M, starting with
+    # first_floor_inventory on the first floor; profiler (a PhaseProfiler) times each stage
+    profiler = profiler or PhaseProfiler(enabled=False)
+    # Generate the simulation table using the simulate_hospital_inventory function
+    with profiler.phase("Simulation"):
+        simulation_table = simulate_hospital_inventory(N=N, M=M, max_days=max_days, days_per_cycle=days_per_cycle,
+                                                       first_floor_inventory=first_floor_inventory)
+    with profiler.phase("Parameters"):
+        parameters = calculate_parameters(simulation_table)
+    return simulation_table, parameters
+
+def calculate_parameters(simulation_table):
+    parameters = {}
+
+    # Average Inventory Levels
+    parameters["Average First Floor Inventory"] = simulation_table["First Floor Inventory"].mean()
+    parameters["Average Basement Inventory"] = simulation_table["Basement Inventory"].mean()
+
+    # Number of Days with Shortages
+    parameters["Days with Shortage"] = simulation_table[simulation_table["Shortage"] > 0].shape[0]
+
+    # Theoretical and Experimental Demand
+    parameters["Theoretical Demand"] = sum([prob * rooms for prob, rooms in zip([0.1, 0.15, 0.35, 0.2, 0.2], [1, 2, 3, 4, 5])])
+    parameters["Experimental Demand"] = simulation_table["Daily Consumption"].mean()
+
+    # Theoretical and Experimental Lead Time
+    parameters["Theoretical Lead Time"] = sum([prob * lead for prob, lead in zip([0.4, 0.35, 0.25], [1, 2, 3])])
+    parameters["Experimental Lead Time"] = simulation_table[simulation_table["Random Lead Time"] > 0]["Lead Time (Days Until Order Arrives)"].mean()
+
+    return parameters
+
+def parse_values(text):
+    # "2,4,6" or "1-10" or "10-60:10" (range with step) -> list of ints
+    values = []
+    for part in text.replace(" ", "").split(","):
+        if "-" in part:
+            bounds, _, step = part.partition(":")
+            low, high = (int(bound) for bound in bounds.split("-"))
+            values.extend(range(low, high + 1, int(step) if step else 1))
+        elif part:
+            values.append(int(part))
+    if not values or min(values) <= 0:
+        raise ValueError("values should be positive integers")
+    return sorted(set(values))
+
+class HospitalApp:
+    # Tkinter GUI for displaying results: table, calculated parameters, inventory graph and policy search
+    def __init__(self, root, simulation_table, parameters, profiler=None, profile_path=None):
+        # matplotlib is only imported once a window is actually built
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        root.title("Hospital Inventory Simulation")
+        self.policy_results = None
+        self.profiler = profiler or PhaseProfiler(enabled=False)
+        self.profile_path = profile_path  # From --profile: every search is profiled and its cProfile stats dumped here
+        # Seeded grid searches keep every cell's replications (also on disk): cost changes and repeated cells are
+        # not simulated again, longer horizons continue the cached runs
+        self.run_cache = RunCache(directory=default_directory)
+
+        # Tab Control
+        tab_control = ttk.Notebook(root)
+
+        # Tab 1 - Simulation Table
+        tab1 = ttk.Frame(tab_control)
+        tab_control.add(tab1, text="Simulation Table")
+
+        # Display Simulation Table (rows are paged in as the user scrolls)
+        with self.profiler.phase("Table"):
+            self.table = VirtualTable(tab1, columns=list(simulation_table.columns), visible_rows=10, column_width=100)
+            self.table.set_data(simulation_table)
+            self.table.pack(padx=10, pady=10)
+
+        # Tab 2 - Calculated Parameters
+        tab2 = ttk.Frame(tab_control)
+        tab_control.add(tab2, text="Calculated Parameters")
+
+        # Display calculated parameters
+        results_label = tk.Label(tab2, text=f"""
+Average First Floor Inventory: {parameters["Average First Floor Inventory"]:.2f}
+Average Basement Inventory: {parameters["Average Basement Inventory"]:.2f}
+Days with Shortage: {parameters["Days with Shortage"]}
+Theoretical Demand: {parameters["Theoretical Demand"]:.2f}
+Experimental Demand: {parameters["Experimental Demand"]:.2f}
+Theoretical Lead Time: {parameters["Theoretical Lead Time"]:.2f}
+Experimental Lead Time: {parameters["Experimental Lead Time"]:.2f}
 """, justify="left")
-results_label.pack(padx=10, pady=10)
-
-# Tab 3 - Graph
-tab3 = ttk.Frame(tab_control)
-tab_control.add(tab3, text="Inventory Levels Graph")
-
-# Plotting the graph
-fig, ax = plt.subplots(figsize=(6, 4))
-ax.plot(simulation_table["Day"], simulation_table["First Floor Inventory"], label="First Floor Inventory")
-ax.plot(simulation_table["Day"], simulation_table["Basement Inventory"], label="Basement Inventory")
-ax.axhline(0, color='red', linestyle='--', label="Shortage Line")
-ax.set_xlabel("Day")
-ax.set_ylabel("Inventory Level")
-ax.set_title("Inventory Levels Over Time")
-ax.legend()
-
-# Display the graph in Tkinter
-canvas = FigureCanvasTkAgg(fig, tab3)
-canvas.get_tk_widget().pack(padx=10, pady=10)
-canvas.draw()
-
-# Start the GUI event loop
-tab_control.pack(expand=1, fill="both")
-root.mainloop()
\ No newline at end of file
+        results_label.pack(padx=10, pady=10)
+
+        # Tab 3 - Graph
+        tab3 = ttk.Frame(tab_control)
+        tab_control.add(tab3, text="Inventory Levels Graph")
+
+        # Plotting the graph
+        with self.profiler.phase("Inventory graph"):
+            fig = Figure(figsize=(6, 4))
+            ax = fig.add_subplot()
+            ax.plot(simulation_table["Day"], simulation_table["First Floor Inventory"], label="First Floor Inventory")
+            ax.plot(simulation_table["Day"], simulation_table["Basement Inventory"], label="Basement Inventory")
+            ax.axhline(0, color='red', linestyle='--', label="Shortage Line")
+            ax.set_xlabel("Day")
+            ax.set_ylabel("Inventory Level")
+            ax.set_title("Inventory Levels Over Time")
+            ax.legend()
+
+            # Display the graph in Tkinter
+            canvas = FigureCanvasTkAgg(fig, tab3)
+            canvas.get_tk_widget().pack(padx=10, pady=10)
+            canvas.draw()
+
+        # Tab 4 - Policy Search (N, M grid with common random numbers across cells)
+        tab4 = ttk.Frame(tab_control)
+        tab_control.add(tab4, text="Policy Search")
+
+        search_frame = ttk.Frame(tab4)
+        search_frame.pack(fill="x", padx=10, pady=5)
+        ttk.Label(search_frame, text="N values:").pack(side="left", padx=5)
+        self.n_values_entry = ttk.Entry(search_frame, width=10)
+        self.n_values_entry.insert(0, "1-10")
+        self.n_values_entry.pack(side="left")
+        ttk.Label(search_frame, text="M values:").pack(side="left", padx=5)
+        self.m_values_entry = ttk.Entry(search_frame, width=10)
+        self.m_values_entry.insert(0, "10-60:5")
+        self.m_values_entry.pack(side="left")
+        ttk.Label(search_frame, text="Replications:").pack(side="left", padx=5)
+        self.search_replications_entry = ttk.Entry(search_frame, width=6)
+        self.search_replications_entry.insert(0, "30")
+        self.search_replications_entry.pack(side="left")
+        ttk.Label(search_frame, text="Days:").pack(side="left", padx=5)
+        self.search_days_entry = ttk.Entry(search_frame, width=8)
+        self.search_days_entry.insert(0, "365")
+        self.search_days_entry.pack(side="left")
+        ttk.Label(search_frame, text="Seed:").pack(side="left", padx=5)
+        self.search_seed_entry = ttk.Entry(search_frame, width=8)
+        self.search_seed_entry.insert(0, "1")
+        self.search_seed_entry.pack(side="left")
+        # Wall time and peak memory of the search in the Performance tab; tracemalloc makes the search slower
+        self.profile = tk.BooleanVar(value=profile_path is not None)
+        ttk.Checkbutton(search_frame, text="Profile", variable=self.profile).pack(side="left", padx=5)
+        self.search_button = ttk.Button(search_frame, text="Run Grid Search", command=self.run_policy_search)
+        self.search_button.pack(side="left", padx=10)
+        self.search_cancel_button = ttk.Button(search_frame, text="Cancel", state="disabled",
+                                               command=lambda: self.search_run.cancel())
+        self.search_cancel_button.pack(side="left")
+        self.search_status = tk.StringVar(value="Ready")
+        ttk.Label(search_frame, textvariable=self.search_status).pack(side="left", padx=10)
+        self.search_run = BackgroundRun(root)
+
+        self.heatmap_metric = tk.StringVar(value="Cost per Day")
+        metric_box = ttk.Combobox(tab4, textvariable=self.heatmap_metric, values=policy_metrics, state="readonly")
+        metric_box.bind("<<ComboboxSelected>>", self.draw_heatmap)
+        metric_box.pack(anchor="w", padx=10)
+
+        heatmap_figure = Figure(figsize=(7, 4))
+        self.heatmap_ax = heatmap_figure.add_subplot()
+        self.heatmap_colorbar = heatmap_figure.colorbar(self.heatmap_ax.imshow([[0]], cmap="viridis"), ax=self.heatmap_ax)
+        self.heatmap_canvas = FigureCanvasTkAgg(heatmap_figure, tab4)
+        self.heatmap_canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=5)
+
+        self.best_policy_text = tk.StringVar()
+        ttk.Label(tab4, textvariable=self.best_policy_text, justify="left").pack(anchor="w", padx=10, pady=5)
+
+        # Tab 5 - Performance (stage timings and peak memory of the start-up run with --profile, then of the last
+        # profiled search)
+        tab5 = ttk.Frame(tab_control)
+        tab_control.add(tab5, text="Performance")
+        self.performance_panel = PerformancePanel(tab5)
+        self.profiler.finish()
+        if self.profiler.enabled:
+            self.performance_panel.show(self.profiler)
+
+        tab_control.pack(expand=1, fill="both")
+
+    # Policy search: parse the grid, run it in the background and draw the chosen metric as a heatmap
+    def run_policy_search(self):
+        try:
+            N_values = parse_values(self.n_values_entry.get())
+            M_values = parse_values(self.m_values_entry.get())
+            replications = int(self.search_replications_entry.get())
+            days = int(self.search_days_entry.get())
+            seed_text = self.search_seed_entry.get().strip()
+            seed = int(seed_text) if seed_text else None  # Blank: new random numbers, nothing cached
+            if replications <= 1 or days <= 0:
+                raise ValueError("need at least 2 replications and a positive number of days")
+        except ValueError as e:
+            showinfo("Input Error", f"Invalid policy search input: {e}")
+            return
+
+        # A fresh profiler per search, so the phases and cProfile stats of earlier searches are not added in
+        profiler = PhaseProfiler(enabled=self.profile.get() or self.profile_path is not None,
+                                 profile_path=self.profile_path)
+        self.profiler = profiler
+        run_cache = self.run_cache
+
+        def work(report, cancel):
+            with profiler.phase(f"Policy search ({len(N_values)}x{len(M_values)})"):
+                return policy_grid_search(N_values, M_values, replications=replications, max_days=days, seed=seed,
+                                          progress=lambda done, total: report(done, total, "Policy runs"), cancel=cancel,
+                                          cache=run_cache)
+
+        self.search_button.config(state="disabled")
+        self.search_cancel_button.config(state="normal")
+        self.search_status.set("Starting...")
+        self.search_run.start(work, on_done=self.show_policy_results, on_progress=self.show_search_progress,
+                              on_error=self.policy_search_failed,
+                              on_cancelled=lambda error: self.finish_policy_search("Cancelled"))
+
+    def show_search_progress(self, done, total, message):
+        self.search_status.set(f"{message}: {done}/{total}")
+
+    def policy_search_failed(self, error):
+        self.finish_policy_search("Failed")
+        showinfo("Policy Search Error", f"The policy search failed: {error}")
+
+    def finish_policy_search(self, status):
+        self.profiler.finish()
+        if self.profiler.enabled:
+            self.performance_panel.show(self.profiler)
+        self.search_button.config(state="normal")
+        self.search_cancel_button.config(state="disabled")
+        self.search_status.set(status)
+
+    def show_policy_results(self, results):
+        self.policy_results = results
+        self.draw_heatmap()
+        self.finish_policy_search(f"Done: {len(results)} policies (cache: {self.run_cache.describe()})")
+
+    def draw_heatmap(self, *args):
+        results = self.policy_results
+        if results is None:
+            return
+        metric = self.heatmap_metric.get()
+        grid = results.pivot(index="N", columns="M", values=metric)
+        half_widths = results.pivot(index="N", columns="M", values=f"{metric} ±")
+
+        ax = self.heatmap_ax
+        ax.clear()
+        image = ax.imshow(grid.values, aspect="auto", origin="lower", cmap="viridis")
+        self.heatmap_colorbar.update_normal(image)
+        ax.set_xticks(range(len(grid.columns)), labels=grid.columns)
+        ax.set_yticks(range(len(grid.index)), labels=grid.index)
+        ax.set_xlabel("Basement Capacity M")
+        ax.set_ylabel("Review Period N")
+        ax.set_title(f"{metric} (mean over replications)")
+        if grid.size <= 150:
+            for row, N in enumerate(grid.index):
+                for col, M in enumerate(grid.columns):
+                    ax.text(col, row, f"{grid.loc[N, M]:.1f}", ha="center", va="center", color="white", fontsize=8)
+        self.heatmap_canvas.draw_idle()
+
+        best = results.loc[results["Cost per Day"].idxmin()]
+        self.best_policy_text.set(
+            f"Lowest cost: N = {int(best['N'])}, M = {int(best['M'])}, cost/day {best['Cost per Day']:.2f} ± {best['Cost per Day ±']:.2f}, "
+            f"shortage days {best['Shortage Days']:.1f} ± {best['Shortage Days ±']:.1f}\n"
+            f"Widest 95% CI on the {metric} map: ± {half_widths.values.max():.2f}"
+        )
+
+def main():
+    # --profile [PATH] times the start-up run and every policy search, and dumps their cProfile stats
+    profile_path = profile_argument()
+    profiler = PhaseProfiler(enabled=profile_path is not None, profile_path=profile_path)
+    simulation_table, parameters = run_hospital_simulation(N=6, M=30, max_days=20, days_per_cycle=6, profiler=profiler)
+    root = tk.Tk()
+    HospitalApp(root, simulation_table, parameters, profiler, profile_path)
+
+    # Start the GUI event loop
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
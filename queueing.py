@@ -0,0 +1,26 @@
+import math
+
+# Closed-form approximations for multi-server queues, used to cross-check the simulated waits
+
+def distribution_moments(probabilities, values):
+    # Mean and variance of a discrete distribution
+    mean = sum(p * v for p, v in zip(probabilities, values))
+    return mean, sum(p * (v - mean) ** 2 for p, v in zip(probabilities, values))
+
+def erlang_c(servers, offered_load):
+    # Probability that an arrival has to wait in an M/M/c queue with offered load a = arrival rate * mean service
+    term = total = 1.0
+    for k in range(1, servers):
+        term *= offered_load / k
+        total += term
+    tail = term * offered_load / servers * servers / (servers - offered_load)
+    return tail / (total + tail)
+
+def allen_cunneen_wait(arrival_rate, mean_service, arrival_scv, service_scv, servers=1):
+    # Mean wait in queue of a G/G/c queue (Allen-Cunneen; Kingman's formula when servers == 1), from the rates and
+    # the squared coefficients of variation of the inter-arrival and service times. inf when the queue is unstable
+    offered_load = arrival_rate * mean_service
+    if offered_load >= servers:
+        return math.inf
+    return (erlang_c(servers, offered_load) / (servers / mean_service - arrival_rate)
+            * (arrival_scv + service_scv) / 2)
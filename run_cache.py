@@ -0,0 +1,177 @@
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict
+
+# Memoized simulation runs keyed by (model, parameters, seed, length). Entries are evicted least recently used first
+# once their sizes add up to more than max_bytes; with a directory, entries put with persist=True are also pickled
+# to disk (one file per entry) and found again by a later session. Runs with seed None are never cached.
+# A cached run that saved its streams and queue/inventory state can be continued to a longer length:
+# take_prefix hands back the longest shorter run (removed from memory, as continuing it changes it in place).
+# Pickles on disk outlive the code that wrote them: their file names carry cache_format, and get/take_prefix take a
+# valid(value) check (e.g. same_layout against fresh instances); anything stale or unreadable is deleted and missed.
+# The disk store is kept under max_disk_bytes by deleting the least recently used files (by mtime, which reads
+# refresh) after every write; temporary files left by a write that never finished are removed when a cache opens.
+
+# Bump whenever a class that is persisted changes its attributes or the meaning of what it holds
+# 2: gas SampledTrace keeps its rows in a TraceStore
+# 3: hospital InventorySummary totals the first floor at the start of each day instead of after it
+# 4: hospital first-floor refills are limited by the basement stock
+cache_format = 4
+
+# Disk store shared by the GUIs
+default_directory = os.path.join(os.path.expanduser("~"), ".cache", "simulation_runs")
+
+class RunCache:
+    def __init__(self, max_bytes=256 * 2**20, directory=None, max_disk_bytes=1024 * 2**20):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # (model, params, seed, length) -> (value, size in bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.continued = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._remove_stale_files()
+
+    def get(self, model, params, seed, length, valid=None):
+        # Cached value for exactly this run, from memory or disk; None when there is none.
+        # valid(value) is False for a value on disk that the current code cannot use
+        if seed is None:
+            return None
+        key = (model, params, seed, length)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        value = self._load(self._path(model, params, seed, length), valid)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.put(model, params, seed, length, value)
+        return value
+
+    def take_prefix(self, model, params, seed, length, valid=None):
+        # (length, value) of the longest cached run shorter than length, for continuing it; None when there is none
+        if seed is None:
+            return None
+        in_memory = [key[3] for key in self.entries if key[:3] == (model, params, seed)]
+        for best in sorted(set(in_memory + self._disk_lengths(model, params, seed)), reverse=True):
+            if best >= length:
+                continue
+            if best in in_memory:
+                value, size = self.entries.pop((model, params, seed, best))
+                self.bytes -= size
+            else:
+                value = self._load(self._path(model, params, seed, best), valid)
+                if value is None:
+                    continue
+            self.continued += 1
+            return best, value
+        return None
+
+    def put(self, model, params, seed, length, value, size=None, persist=False):
+        # size: bytes the value holds in memory (default: its pickled size)
+        if seed is None:
+            return
+        data = None
+        if size is None or persist:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            size = size or len(data)
+        key = (model, params, seed, length)
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        if size <= self.max_bytes:
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+        if persist and self.directory is not None:
+            path = self._path(model, params, seed, length)
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            os.replace(path + ".tmp", path)  # A crash mid-write never leaves a truncated entry behind
+            self._trim_disk()
+
+    def describe(self):
+        return (f"{len(self.entries)} runs, {self.bytes / 2**20:.1f} of {self.max_bytes / 2**20:.0f} MB; "
+                f"{self.hits} hits, {self.misses} misses ({self.continued} continued from a shorter run)")
+
+    def _stem(self, model, params, seed):
+        return f"v{cache_format}-" + hashlib.sha1(repr((model, params, seed)).encode()).hexdigest()[:20]
+
+    def _path(self, model, params, seed, length):
+        return os.path.join(self.directory, f"{self._stem(model, params, seed)}-{length}.pkl") if self.directory else None
+
+    def _disk_lengths(self, model, params, seed):
+        if self.directory is None:
+            return []
+        stem = self._stem(model, params, seed) + "-"
+        return [int(name[len(stem):-4]) for name in os.listdir(self.directory)
+                if name.startswith(stem) and name.endswith(".pkl")]
+
+    def _load(self, path, valid=None):
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except Exception:
+            value = None  # Unreadable, truncated or naming classes that no longer exist
+        if value is None or (valid is not None and not valid(value)):
+            # Written by an incompatible version: remove it so the run is simulated and stored again
+            _remove(path)
+            return None
+        try:
+            os.utime(path)  # Recently used, so the disk budget evicts it last
+        except OSError:
+            pass
+        return value
+
+    def _remove_stale_files(self):
+        # Entries of other cache formats can never be read again; a .tmp file older than an hour is what is left
+        # of a write that crashed (younger ones may still be written by another window)
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".pkl") and not name.startswith(f"v{cache_format}-"):
+                _remove(path)
+            elif name.endswith(".tmp"):
+                try:
+                    if now - os.path.getmtime(path) > 3600:
+                        _remove(path)
+                except OSError:
+                    pass
+
+    def _trim_disk(self):
+        # Delete the least recently used entries until the store fits in max_disk_bytes
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                try:
+                    status = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # Removed meanwhile by another window
+                entries.append((status.st_mtime, status.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(os.path.join(self.directory, name))
+            total -= size
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def same_layout(value, template):
+    # True when value is an instance of template's class with the same instance attributes, i.e. it was pickled
+    # by code that built the class the way the current code does
+    return type(value) is type(template) and vars(value).keys() == vars(template).keys()
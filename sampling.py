@@ -0,0 +1,109 @@
+import numpy as np
+
+# Discrete distributions sampled in O(1) per draw, built once per distribution and shared by both models.
+# Probabilities that are whole multiples of 1/resolution (resolution a power of ten up to max_resolution) get a
+# lookup table: the random number int(u * resolution) + offset indexes the table directly, which is exactly the
+# numbers-to-values mapping of the tables in the models. Other probabilities use Walker's alias method.
+# Either way each draw uses one uniform, so a stream is consumed the same whatever the method.
+
+max_resolution = 10**6
+
+def table_resolution(*probability_lists):
+    # Smallest power of ten from 100 at which all the probabilities are whole slots, None if there is none
+    probabilities = np.concatenate([np.asarray(p, dtype=float) for p in probability_lists])
+    resolution = 100
+    while resolution <= max_resolution:
+        slots = probabilities * resolution
+        if np.allclose(slots, np.round(slots), rtol=0, atol=1e-6):
+            return resolution
+        resolution *= 10
+    return None
+
+class DiscreteSampler:
+    # values[i] with probability probabilities[i]. method is "table", "alias" or "auto" (table when it fits);
+    # seed seeds the sampler's own Generator, used by sample() when no rng is passed
+    def __init__(self, values, probabilities, method="auto", resolution=None, offset=0, seed=None):
+        probabilities = np.asarray(probabilities, dtype=float)
+        if len(values) != len(probabilities) or not len(values):
+            raise ValueError("values and probabilities must be non-empty and the same length")
+        if probabilities.min() < 0 or not np.isclose(probabilities.sum(), 1.0):
+            raise ValueError("probabilities must be non-negative and sum to 1")
+        self.values = np.asarray(values)
+        self.probabilities = probabilities
+        self.offset = offset
+        self.rng = np.random.default_rng(seed)
+        if method == "auto":
+            resolution = resolution or table_resolution(probabilities)
+            method = "table" if resolution else "alias"
+        self.method = method
+        if method == "table":
+            self.resolution = resolution or table_resolution(probabilities)
+            if self.resolution is None:
+                raise ValueError(f"probabilities are not whole slots at any resolution up to {max_resolution}")
+            counts = np.round(probabilities * self.resolution).astype(np.int64)
+            counts[-1] = self.resolution - counts[:-1].sum()  # Absorb rounding so the table has exactly resolution slots
+            self.table = np.concatenate([np.full(offset, self.values[0]), np.repeat(self.values, counts)])
+        elif method == "alias":
+            self.resolution = None
+            self.table = None
+            self.alias_probability, self.alias = alias_tables(probabilities)
+        else:
+            raise ValueError(f"unknown method {method!r}, expected auto, table or alias")
+        # Plain Python copies for scalar draws, which are much faster indexing lists than NumPy arrays
+        self._table_list = self.table.tolist() if self.table is not None else None
+        if self.method == "alias":
+            self._alias_lists = (self.values.tolist(), self.alias_probability.tolist(), self.alias.tolist())
+
+    @classmethod
+    def from_ranges(cls, ranges, resolution=100, offset=1, seed=None):
+        # Table sampler from {(low, high): value} with inclusive ranges of the random number
+        # int(u * resolution) + offset, as in the hospital tables (1-100)
+        numbers = np.arange(offset, offset + resolution)
+        values = [value for _, value in sorted(ranges.items())]
+        counts = [int(((numbers >= low) & (numbers <= high)).sum()) for (low, high), _ in sorted(ranges.items())]
+        if sum(counts) != resolution:
+            raise ValueError(f"ranges must cover {offset}-{offset + resolution - 1} exactly once")
+        return cls(values, np.array(counts) / resolution, method="table", resolution=resolution, offset=offset,
+                   seed=seed)
+
+    def lookup(self, number):
+        # Value for one table random number
+        return self._table_list[number]
+
+    def lookup_array(self, numbers):
+        return self.table[numbers]
+
+    def sample(self, size=None, rng=None):
+        # Value for one uniform (size None) or an array of size values
+        rng = rng or self.rng
+        if self.method == "table":
+            if size is None:
+                return self._table_list[int(rng.random() * self.resolution) + self.offset]
+            return self.table[(rng.random(size) * self.resolution).astype(np.int64) + self.offset]
+        # Alias method: the integer part of u * k picks a column, the fraction decides between it and its alias
+        k = len(self.values)
+        if size is None:
+            values, alias_probability, alias = self._alias_lists
+            scaled = rng.random() * k
+            column = int(scaled)
+            return values[column if scaled - column < alias_probability[column] else alias[column]]
+        scaled = rng.random(size) * k
+        column = scaled.astype(np.int64)
+        keep = scaled - column < self.alias_probability[column]
+        return self.values[np.where(keep, column, self.alias[column])]
+
+def alias_tables(probabilities):
+    # Walker's alias tables (Vose's construction): column i keeps i with alias_probability[i], else gives alias[i]
+    k = len(probabilities)
+    scaled = np.asarray(probabilities, dtype=float) * k
+    alias_probability = np.ones(k)
+    alias = np.arange(k)
+    small = [i for i in range(k) if scaled[i] < 1.0]
+    large = [i for i in range(k) if scaled[i] >= 1.0]
+    while small and large:
+        low, high = small.pop(), large.pop()
+        alias_probability[low] = scaled[low]
+        alias[low] = high
+        scaled[high] -= 1.0 - scaled[low]
+        (small if scaled[high] < 1.0 else large).append(high)
+    return alias_probability, alias  # Columns left over are (up to rounding) exactly full
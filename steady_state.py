@@ -0,0 +1,99 @@
+import numpy as np
+
+from confidence import confidence_interval
+
+# Steady-state estimation from one long run: the warm-up (start from empty pumps) is found with MSER on batch means
+# and dropped, then the rest is cut into a few large batches whose means are treated as independent observations.
+
+class BatchSeries:
+    # Means of consecutive batches of a series in constant memory: batch_size observations per batch, and when
+    # max_batches are complete, neighbouring batches are merged and the batch size doubles
+    def __init__(self, batch_size=5, max_batches=4096):
+        self.batch_size = batch_size
+        self.max_batches = max_batches  # Even, so batches always merge in pairs
+        self.means = []
+        self.count = 0
+        self.partial_sum = 0.0
+        self.partial_count = 0
+
+    def update(self, value):
+        self.count += 1
+        self.partial_sum += value
+        self.partial_count += 1
+        if self.partial_count == self.batch_size:
+            self._close_batch()
+
+    def update_array(self, values):
+        values = np.asarray(values, dtype=float)
+        self.count += len(values)
+        while len(values):
+            # Finish the open batch first
+            need = self.batch_size - self.partial_count
+            if self.partial_count or len(values) < self.batch_size:
+                self.partial_sum += float(values[:need].sum())
+                self.partial_count += min(need, len(values))
+                values = values[need:]
+                if self.partial_count == self.batch_size:
+                    self._close_batch()
+                continue
+            # Then as many whole batches as fit before the next merge
+            batches = min(len(values) // self.batch_size, self.max_batches - len(self.means))
+            whole = values[:batches * self.batch_size]
+            self.means.extend(whole.reshape(batches, self.batch_size).mean(axis=1).tolist())
+            values = values[batches * self.batch_size:]
+            if len(self.means) == self.max_batches:
+                self._merge()
+
+    def _close_batch(self):
+        self.means.append(self.partial_sum / self.partial_count)
+        self.partial_sum = 0.0
+        self.partial_count = 0
+        if len(self.means) == self.max_batches:
+            self._merge()
+
+    def _merge(self):
+        means = np.asarray(self.means)
+        self.means = ((means[0::2] + means[1::2]) / 2).tolist()
+        self.batch_size *= 2
+
+def mser_truncation(batch_means):
+    # Number of leading batches to drop: the d minimizing the MSER statistic
+    # sum((z[d:] - mean(z[d:]))**2) / (k - d)**2, searched over the first half of the k batches
+    z = np.asarray(batch_means, dtype=float)
+    k = len(z)
+    if k < 2:
+        return 0
+    remaining = np.arange(k, 0, -1)  # k - d for d = 0..k-1
+    suffix_sum = np.cumsum(z[::-1])[::-1]
+    suffix_squares = np.cumsum((z * z)[::-1])[::-1]
+    mser = (suffix_squares - suffix_sum ** 2 / remaining) / remaining ** 2
+    return int(np.argmin(mser[:k // 2 + 1]))
+
+def steady_state_interval(series, n_batches=20):
+    # MSER warm-up truncation on a BatchSeries, then the batch-means mean and 95% CI half-width.
+    # The truncation runs on the series' batches, so it is MSER-<batch_size> (5 until the first merge, then 10, 20...);
+    # warmup counts the observations it drops, trimmed the ones after it dropped to make n_batches equal batches.
+    # None while the series is too short to leave n_batches batches after the warm-up
+    means = np.asarray(series.means, dtype=float)
+    warmup = mser_truncation(means)
+    kept = means[warmup:]
+    usable = len(kept) // n_batches * n_batches
+    if usable < n_batches:
+        return None
+    kept = kept[len(kept) - usable:]  # The leftover batches are dropped from the start, next to the warm-up
+    mean, half_width = confidence_interval(kept.reshape(n_batches, -1).mean(axis=1))
+    return {
+        "mean": mean,
+        "half_width": half_width,
+        "warmup": warmup * series.batch_size,
+        "trimmed": (len(means) - warmup - usable) * series.batch_size,
+        "batch_size": series.batch_size,
+        "observations": usable * series.batch_size,
+    }
+
+def precision_reached(series, relative_precision, n_batches=20):
+    # Sequential stopping rule: the steady-state CI half-width is within relative_precision of the mean
+    estimate = steady_state_interval(series, n_batches)
+    if estimate is None or not estimate["mean"]:
+        return False
+    return estimate["half_width"] <= relative_precision * abs(estimate["mean"])
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+import gas_station
+import hospital
+from run_cache import RunCache
+
+# Same seed => same results, on every path through each model: scalar engine, batch engine, chunked runs,
+# summary-only runs, and runs continued from a shorter one (directly or through the run cache)
+
+seeds = [0, 1, 42]
+servers_options = [(1, 1, 1), (2, 1, 3)]
+
+def assert_same_figures(figures, expected):
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            for name, item in value.items():
+                assert figures[key][name] == pytest.approx(item), (key, name)
+        else:
+            assert figures[key] == pytest.approx(value), key
+
+def concatenated(chunks):
+    chunks = list(chunks)
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Gas station
+
+@pytest.mark.parametrize("servers", servers_options)
+@pytest.mark.parametrize("seed", seeds)
+def test_gas_batch_matches_scalar(seed, servers):
+    state = gas_station.simulate(3000, seed=seed, servers=servers)
+    scalar = state.trace.columns()
+    batch = gas_station.simulate_batch(3000, seed=seed, servers=servers)
+    for key in gas_station.trace_dtypes:
+        assert batch[key].tolist() == scalar[key].tolist(), key
+    assert state.table().equals(gas_station.batch_to_table(batch))
+    for code, pump in enumerate(gas_station.pumps):
+        on_pump = batch["pump"] == code
+        assert batch["wait"][on_pump].tolist() == state.waiting_times[pump].tolist()
+        assert batch["queue_length"][on_pump].tolist() == state.queue_lengths[pump].tolist()
+        assert int(batch["idle_time"][on_pump].sum()) == state.idle_times[pump]
+
+@pytest.mark.parametrize("servers", servers_options)
+@pytest.mark.parametrize("seed", seeds)
+def test_gas_chunks_match_batch(seed, servers):
+    batch = gas_station.simulate_batch(3000, seed=seed, servers=servers)
+    chunks = concatenated(gas_station.simulate_chunks(3000, seed=seed, chunk_size=397, servers=servers))
+    for key, values in batch.items():
+        assert chunks[key].tolist() == values.tolist(), key
+
+@pytest.mark.parametrize("servers", servers_options)
+@pytest.mark.parametrize("seed", seeds)
+def test_gas_summary_matches_scalar(seed, servers):
+    expected = gas_station.simulate(3000, seed=seed, servers=servers).figures()
+    summary = gas_station.simulate_summary(3000, seed=seed, chunk_size=397, servers=servers)
+    assert_same_figures(summary.figures(), expected)
+
+@pytest.mark.parametrize("seed", seeds)
+def test_gas_continued_run_matches_fresh_run(seed):
+    state = gas_station.simulate(1000, seed=seed, servers=(2, 1, 3))
+    state.table()  # Exported columns must not stop the run from growing
+    gas_station.simulate(3000, state=state)
+    fresh = gas_station.simulate(3000, seed=seed, servers=(2, 1, 3))
+    assert state.table().equals(fresh.table())
+    assert_same_figures(state.figures(), fresh.figures())
+
+    summary = gas_station.simulate_summary(1000, seed=seed, chunk_size=397)
+    gas_station.simulate_summary(3000, summary=summary, chunk_size=397)
+    assert_same_figures(summary.figures(), gas_station.simulate_summary(3000, seed=seed).figures())
+
+@pytest.mark.parametrize("summary_only", [False, True])
+@pytest.mark.parametrize("seed", seeds)
+def test_gas_cache_continuation_matches_fresh_run(tmp_path, seed, summary_only):
+    cache = RunCache(directory=str(tmp_path))
+    gas_station.simulate_cached(cache, 1000, seed, servers=(2, 1, 3), summary_only=summary_only)
+    if summary_only:
+        cache = RunCache(directory=str(tmp_path))  # A later session continues the summary from the disk store
+    continued, _ = gas_station.simulate_cached(cache, 3000, seed, servers=(2, 1, 3), summary_only=summary_only)
+    assert cache.continued == 1
+    fresh, _ = gas_station.simulate_cached(None, 3000, seed, servers=(2, 1, 3), summary_only=summary_only)
+    assert_same_figures(continued.figures(), fresh.figures())
+    assert gas_station.simulate_cached(cache, 3000, seed, servers=(2, 1, 3), summary_only=summary_only)[0] is continued
+
+#-----------------------------------------------------------------------------------------------------------------------------
+# Hospital
+
+@pytest.mark.parametrize("N, M", [(6, 30), (3, 12), (1, 5)])
+@pytest.mark.parametrize("seed", seeds)
+def test_hospital_batch_matches_scalar(seed, N, M):
+    scalar = hospital.simulate_hospital_inventory(N, M, max_days=2000, seed=seed)
+    for use_numba in (True, False):
+        batch = hospital.simulate_hospital_batch(N, M, max_days=2000, seed=seed, use_numba=use_numba)
+        for column in hospital.columns:
+            assert batch[column].tolist() == scalar[column].tolist(), column
+
+@pytest.mark.parametrize("seed", seeds)
+def test_hospital_chunks_and_summary_match_batch(seed):
+    batch = hospital.simulate_hospital_batch(3, 12, max_days=2000, seed=seed)
+    chunks = concatenated(hospital.simulate_hospital_chunks(3, 12, max_days=2000, seed=seed, chunk_size=97))
+    for column in hospital.columns:
+        assert chunks[column].tolist() == batch[column].tolist(), column
+
+    expected = hospital.InventorySummary()
+    expected.update(batch)
+    summary = hospital.simulate_hospital_summary(3, 12, max_days=500, seed=seed, chunk_size=97)
+    hospital.simulate_hospital_summary(3, 12, max_days=2000, summary=summary, chunk_size=97)
+    assert summary.metrics() == pytest.approx(expected.metrics())
+
+def test_hospital_policy_cache_continuation_matches_fresh_search(tmp_path):
+    cache = RunCache(directory=str(tmp_path))
+    hospital.policy_grid_search([2, 6], [12, 30], replications=3, max_days=200, seed=1, cache=cache, max_workers=2)
+    continued = hospital.policy_grid_search([2, 6], [12, 30], replications=3, max_days=500, seed=1,
+                                            cache=RunCache(directory=str(tmp_path)), max_workers=2)
+    fresh = hospital.policy_grid_search([2, 6], [12, 30], replications=3, max_days=500, seed=1, max_workers=2)
+    assert continued.equals(fresh)
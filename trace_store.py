@@ -0,0 +1,58 @@
+import array
+
+import numpy as np
+
+# Compact per-row traces for the scalar engines: one growable typed column per field (array.array with a small
+# integer dtype) instead of a dict or list per row. Tight loops append through bound appenders(); columns() gives
+# NumPy views on the same memory and to_frame() a DataFrame on top of those views, codes shown as labels.
+
+class TraceStore:
+    def __init__(self, schema):
+        # schema: {column: NumPy dtype}, in column order
+        self.schema = {name: np.dtype(dtype) for name, dtype in schema.items()}
+        self._arrays = {}
+        for name, dtype in self.schema.items():
+            self._arrays[name] = array.array(dtype.char)
+            if self._arrays[name].itemsize != dtype.itemsize:
+                raise ValueError(f"no array typecode matches {dtype} for column {name!r}")
+        self._exported = False
+
+    def __len__(self):
+        return len(next(iter(self._arrays.values()))) if self._arrays else 0
+
+    @property
+    def nbytes(self):
+        return sum(len(column) * column.itemsize for column in self._arrays.values())
+
+    def appenders(self):
+        # Bound append of every column, in schema order. A column with live NumPy views cannot grow, so after
+        # columns() the arrays are copied first; the views handed out keep the old rows
+        if self._exported:
+            self._arrays = {name: array.array(column.typecode, column) for name, column in self._arrays.items()}
+            self._exported = False
+        return [column.append for column in self._arrays.values()]
+
+    def extend(self, columns):
+        # Append whole columns, e.g. a chunk of batch-engine arrays (cast to the schema dtypes)
+        self.appenders()
+        for name, column in self._arrays.items():
+            column.frombytes(np.ascontiguousarray(columns[name], dtype=self.schema[name]).tobytes())
+
+    def columns(self):
+        # {column: NumPy array} sharing memory with the store
+        self._exported = True
+        return {name: np.frombuffer(column, dtype=self.schema[name]) for name, column in self._arrays.items()}
+
+    def to_frame(self, names=None, labels=None):
+        return frame_from_columns(self.columns(), names, labels)
+
+def frame_from_columns(columns, names=None, labels=None):
+    # DataFrame over the given arrays without copying them. names: {column: display name};
+    # labels: {column: list of labels} for code columns, shown as pandas Categoricals on the same codes
+    import pandas as pd
+    data = {}
+    for name, values in columns.items():
+        if labels and name in labels:
+            values = pd.Categorical.from_codes(values, categories=labels[name])
+        data[names.get(name, name) if names else name] = values
+    return pd.DataFrame(data, copy=False)
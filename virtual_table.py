@@ -0,0 +1,128 @@
+import tkinter as tk
+from tkinter import ttk
+
+class VirtualTable(ttk.Frame):
+    # Treeview that only materializes the rows in view; rows are paged from the data as the user scrolls.
+    # data can be a DataFrame, a dict of column arrays or a list of row dicts keyed by column name.
+    def __init__(self, master, columns, visible_rows=25, buffer_rows=50, column_width=120, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = list(columns)
+        self.visible_rows = visible_rows
+        self.buffer_rows = buffer_rows
+        self.first_row = 0
+        self.row_count = 0
+        self._fetch = lambda start, stop: []
+        self._page_start = 0
+        self._page = []
+
+        # Table body: a fixed set of item ids whose values are swapped while scrolling
+        body = ttk.Frame(self)
+        body.pack(side="top", fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=self.columns, show="headings", height=visible_rows)
+        for col in self.columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_width, anchor="center")
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.items = [self.tree.insert("", tk.END, values=()) for _ in range(visible_rows)]
+
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1, "units"))
+        for key, amount, what in (("<Up>", -1, "units"), ("<Down>", 1, "units"),
+                                  ("<Prior>", -1, "pages"), ("<Next>", 1, "pages")):
+            self.tree.bind(key, lambda event, amount=amount, what=what: self.scroll(amount, what))
+        self.tree.bind("<Home>", lambda event: self.jump_to(0))
+        self.tree.bind("<End>", lambda event: self.jump_to(self.row_count - 1))
+
+        # Footer: row count and jump-to-row
+        footer = ttk.Frame(self)
+        footer.pack(side="bottom", fill="x")
+        self.count_text = tk.StringVar(value="Rows: 0")
+        ttk.Label(footer, textvariable=self.count_text).pack(side="left", padx=5)
+        self.jump_entry = ttk.Entry(footer, width=10)
+        self.jump_entry.bind("<Return>", lambda event: self._jump_from_entry())
+        ttk.Button(footer, text="Go to row", command=self._jump_from_entry).pack(side="right", padx=5)
+        self.jump_entry.pack(side="right", padx=5)
+
+    def set_data(self, data):
+        # Show new data from the first row; nothing is copied out of it until rows come into view
+        self.row_count, self._fetch = _row_source(data, self.columns)
+        self._page = []
+        self.count_text.set(f"Rows: {self.row_count:,}")
+        self.first_row = 0
+        self._render()
+
+    def clear(self):
+        self.set_data([])
+
+    def scroll(self, amount, what="units"):
+        step = self.visible_rows if what == "pages" else 1
+        self.jump_to(self.first_row + int(amount) * step, align_top=True)
+        return "break"
+
+    def jump_to(self, row, align_top=False):
+        # Scroll so `row` (0-based) is the first visible row where possible, and select it unless align_top
+        last_first = max(0, self.row_count - self.visible_rows)
+        self.first_row = min(max(0, row), last_first)
+        self._render()
+        if not align_top and 0 <= row < self.row_count:
+            item = self.items[row - self.first_row]
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+        return "break"
+
+    def _jump_from_entry(self):
+        try:
+            row = int(self.jump_entry.get())
+        except ValueError:
+            return
+        self.jump_to(row - 1)  # Rows are numbered from 1 on screen
+
+    def _on_scrollbar(self, action, amount, what=None):
+        if action == "moveto":
+            self.jump_to(int(float(amount) * self.row_count), align_top=True)
+        else:
+            self.scroll(amount, what)
+
+    def _rows(self, start, stop):
+        # Rows start..stop from the cached page, refetching a page with buffer_rows on each side when needed
+        if not (self._page_start <= start and stop <= self._page_start + len(self._page)):
+            self._page_start = max(0, start - self.buffer_rows)
+            self._page = self._fetch(self._page_start, min(self.row_count, stop + self.buffer_rows))
+        return self._page[start - self._page_start:stop - self._page_start]
+
+    def _render(self):
+        stop = min(self.row_count, self.first_row + self.visible_rows)
+        rows = self._rows(self.first_row, stop)
+        for index, item in enumerate(self.items):
+            self.tree.item(item, values=rows[index] if index < len(rows) else ())
+        if self.row_count:
+            self.scrollbar.set(self.first_row / self.row_count, stop / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+def _display(value):
+    # Missing values (None, NaN, pandas NA) show as empty cells
+    if value is None or (isinstance(value, float) and value != value) or type(value).__name__ == "NAType":
+        return ""
+    return value
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+def _row_source(data, columns):
+    # (row count, fetch(start, stop) -> list of row value lists) for the supported data layouts
+    if hasattr(data, "iloc"):
+        frame = data[columns]
+        return len(frame), lambda start, stop: [
+            [_display(value) for value in row] for row in frame.iloc[start:stop].itertuples(index=False, name=None)
+        ]
+    if isinstance(data, dict):
+        arrays = [data[col] for col in columns]
+        count = len(arrays[0]) if arrays else 0
+        return count, lambda start, stop: [
+            [_display(value) for value in row] for row in zip(*(_as_list(array[start:stop]) for array in arrays))
+        ]
+    return len(data), lambda start, stop: [[_display(entry[col]) for col in columns] for entry in data[start:stop]]